@@ -0,0 +1,181 @@
+"""Извлечение текста статей: селекторы lxml для известных сайтов, readability для остальных."""
+
+import codecs
+import re
+from collections import namedtuple
+from urllib.parse import urlparse
+
+Extraction = namedtuple("Extraction", ["text", "extractor"])
+
+MIN_EXTRACTED_CHARS = 200 # меньше — вёрстка сайта, вероятно, изменилась, берём readability
+BLOCK_TAGS = ("p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre")
+
+# Служебные фразы, которые попадают в текст статьи при любой вёрстке
+BOILERPLATE_PATTERNS = [
+    re.compile(r"^Titel:\s*", re.IGNORECASE | re.MULTILINE),
+    re.compile(r"Diese Nachricht wurde am .*? gesendet\.", re.IGNORECASE | re.DOTALL),
+]
+
+# Элементы, которые никогда не относятся к тексту статьи
+COMMON_DROP_SELECTORS = [
+    "script", "style", "noscript", "figure", "aside", "nav", "footer", "form", "button", "iframe",
+]
+
+
+class SelectorExtractor:
+    """
+    Извлекает текст по CSS-селекторам известной вёрстки: lead — вводный абзац,
+    paragraphs — абзацы тела статьи. Элементы из drop удаляются до извлечения.
+    Каждый найденный элемент даёт одну строку текста.
+    """
+
+    def __init__(self, name, paragraphs, lead=None, drop=()):
+        from lxml.cssselect import CSSSelector
+        self.name = name
+        self.lead = CSSSelector(lead) if lead else None
+        self.paragraphs = CSSSelector(paragraphs)
+        self.drop = CSSSelector(", ".join(COMMON_DROP_SELECTORS + list(drop)))
+
+    def extract(self, html):
+        tree = parse_document(html)
+        for element in self.drop(tree):
+            element.drop_tree()
+        blocks = self.lead(tree)[:1] if self.lead else []
+        blocks += self.paragraphs(tree)
+        return join_lines(element_text(block) for block in blocks)
+
+
+class ReadabilityExtractor:
+    """Универсальное извлечение через readability для неизвестной вёрстки"""
+
+    name = "readability"
+
+    def extract(self, html):
+        from lxml import html as lxml_html
+        from readability import Document
+        summary = lxml_html.fromstring(Document(html).summary(html_partial=True))
+        blocks = [element for element in summary.iter(*BLOCK_TAGS) if not has_block_ancestor(element)]
+        return join_lines(element_text(block) for block in blocks or [summary])
+
+
+EXTRACTORS = {}
+FALLBACK_EXTRACTOR = ReadabilityExtractor()
+
+
+def register_extractor(domain, extractor):
+    """Регистрирует извлекатель для домена (и всех его поддоменов)"""
+    EXTRACTORS[domain.lower()] = extractor
+    return extractor
+
+
+def get_extractor(url):
+    """Извлекатель для URL: по самому длинному совпадающему домену, иначе None"""
+    host = (urlparse(url).hostname or "").lower()
+    while host:
+        if host in EXTRACTORS:
+            return EXTRACTORS[host]
+        host = host.partition(".")[2]
+    return None
+
+
+def extract_article(url, html, encoding=None):
+    """
+    Возвращает Extraction(text, extractor) для HTML статьи. Байты декодируются
+    по encoding из заголовка HTTP, иначе по meta-тегам (см. decode_html). Если
+    селекторы сайта ничего не нашли (или текста слишком мало), используется readability.
+    """
+    html = decode_html(html, encoding)
+    extractor = get_extractor(url)
+    if extractor is not None:
+        text = extractor.extract(html)
+        if len(text) >= MIN_EXTRACTED_CHARS:
+            return Extraction(text, extractor.name)
+    text = FALLBACK_EXTRACTOR.extract(html)
+    name = FALLBACK_EXTRACTOR.name if extractor is None else f"{FALLBACK_EXTRACTOR.name} ({extractor.name} fallback)"
+    return Extraction(text, name)
+
+
+def decode_html(html, encoding=None):
+    """
+    Декодирует HTML: по кодировке из заголовка Content-Type, а без неё — как
+    readability (meta charset, затем chardet). lxml без подсказки читает байты
+    без meta-тега как Latin-1.
+    """
+    if isinstance(html, str):
+        return html
+    try:
+        codecs.lookup(encoding or "")
+    except LookupError:
+        from readability.encoding import get_encoding
+        encoding = get_encoding(html)
+    return html.decode(encoding, "replace")
+
+
+def parse_document(html):
+    """Дерево lxml из строки HTML (объявление кодировки в документе игнорируется)"""
+    from lxml import html as lxml_html
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    return lxml_html.document_fromstring(html.encode("utf-8", "replace"), parser=parser)
+
+
+def element_text(element):
+    return " ".join(element.text_content().split())
+
+
+def has_block_ancestor(element):
+    return any(ancestor.tag in BLOCK_TAGS for ancestor in element.iterancestors())
+
+
+def join_lines(lines):
+    """Склеивает абзацы в текст, убирая служебные фразы, пустые строки и повторы (lead часто дублирует первый абзац)"""
+    seen = set()
+    result = []
+    for line in lines:
+        line = strip_boilerplate(line)
+        if line and line not in seen:
+            seen.add(line)
+            result.append(line)
+    return "\n".join(result)
+
+
+def strip_boilerplate(text):
+    for pattern in BOILERPLATE_PATTERNS:
+        text = pattern.sub("", text)
+    return text.strip()
+
+
+register_extractor("deutschlandfunk.de", SelectorExtractor(
+    "deutschlandfunk",
+    lead=".article-header-description",
+    paragraphs=".article-details-text p, p.article-details-text",
+))
+register_extractor("tagesschau.de", SelectorExtractor(
+    "tagesschau",
+    paragraphs="article p.textabsatz",
+    drop=(".teaser-absatz", ".meldungsfooter"),
+))
+register_extractor("spiegel.de", SelectorExtractor(
+    "spiegel",
+    lead="article header .RichText",
+    paragraphs="[data-area='body'] .RichText > p",
+))
+register_extractor("zeit.de", SelectorExtractor(
+    "zeit",
+    lead=".summary",
+    paragraphs=".article-body p.paragraph",
+))
+register_extractor("tagesspiegel.de", SelectorExtractor(
+    "tagesspiegel",
+    lead="article header p",
+    paragraphs="#story-elements > p",
+))
+register_extractor("faz.net", SelectorExtractor(
+    "faz",
+    lead=".header-teaser",
+    paragraphs="p.body-elements__paragraph",
+))
+register_extractor("aljazeera.com", SelectorExtractor(
+    "aljazeera",
+    lead=".article__subhead",
+    paragraphs=".wysiwyg > p",
+))
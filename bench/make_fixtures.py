@@ -0,0 +1,292 @@
+"""
+Фикстуры для офлайн-бенчмарков: RSS-ленты из FEEDS и HTML-страницы статей.
+
+    python bench/make_fixtures.py            # детерминированные фикстуры по шаблонам сайтов
+    python bench/make_fixtures.py --record   # записать живые ленты и статьи (нужна сеть)
+
+Фикстуры лежат в bench/fixtures: feeds/<slug>.xml, articles/<host>/<file>,
+index.json связывает URL ленты из FEEDS с файлом. Ссылки в лентах остаются
+оригинальными — стаб-сервер (bench/stub_server.py) отдаёт их по хосту и пути.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(ROOT, "bench", "fixtures")
+ITEMS_PER_FEED = 4
+RECORD_ARTICLES_PER_FEED = 5
+
+# Ленты из FEEDS: короткое имя файла и хост статей
+FEED_FIXTURES = {
+    "https://www.deutschlandfunk.de/nachrichten-100.rss": ("dlf-nachrichten", "www.deutschlandfunk.de"),
+    "https://www.deutschlandfunk.de/politikportal-100.rss": ("dlf-politik", "www.deutschlandfunk.de"),
+    "https://www.deutschlandfunk.de/wirtschaft-106.rss": ("dlf-wirtschaft", "www.deutschlandfunk.de"),
+    "https://www.spiegel.de/thema/deutschland/index.rss": ("spiegel-deutschland", "www.spiegel.de"),
+    "https://www.tagesschau.de/inland/migration-101~rss.xml": ("tagesschau-migration", "www.tagesschau.de"),
+    "https://www.spiegel.de/thema/integration/index.rss": ("spiegel-integration", "www.spiegel.de"),
+    "https://www.zeit.de/serie/die-aufdecker/index.xml": ("zeit-aufdecker", "www.zeit.de"),
+    "https://www.tagesspiegel.de/feed/politik-deutschland.xml": ("tagesspiegel-politik", "www.tagesspiegel.de"),
+    "https://www.aljazeera.com/xml/rss/all.xml": ("aljazeera-all", "www.aljazeera.com"),
+    "https://www.faz.net/rss/aktuell/politik/inland": ("faz-inland", "www.faz.net"),
+}
+
+TOPICS_DE = [
+    ("Bundestag beschließt Reform der Migrationspolitik", [
+        "Der Bundestag hat am Donnerstag mit den Stimmen der Koalition eine Reform der Migrationspolitik beschlossen.",
+        "Das Gesetz sieht schnellere Asylverfahren und mehr Personal für die Bundespolizei an den Grenzen vor.",
+        "Die Union kritisierte den Entwurf als unzureichend und verlangte Zurückweisungen an der Grenze.",
+        "Die Grünen verwiesen auf die Integration von Geflüchteten in den Arbeitsmarkt.",
+        "Der Bundesrat muss dem Gesetz noch zustimmen, die Länder fordern mehr Geld für die Unterbringung.",
+    ]),
+    ("Regierung einigt sich auf Haushalt für das kommende Jahr", [
+        "Die Bundesregierung hat sich nach langen Verhandlungen auf den Haushalt für das kommende Jahr geeinigt.",
+        "Finanzminister und Kanzler stellten den Entwurf am Mittwoch in Berlin vor.",
+        "Vorgesehen sind höhere Ausgaben für Verteidigung und Infrastruktur, beim Bürgergeld soll gespart werden.",
+        "Die Opposition sprach von Haushaltstricks und kündigte Widerstand im Bundestag an.",
+        "Ökonomen warnen, dass die Wirtschaft weiterhin kaum wächst und die Steuereinnahmen hinter den Erwartungen bleiben.",
+    ]),
+    ("Streik bei der Bahn legt Fernverkehr lahm", [
+        "Ein Streik der Lokführergewerkschaft hat am Montag große Teile des Fernverkehrs in Deutschland lahmgelegt.",
+        "Die Bahn richtete einen Notfahrplan ein, Pendler mussten auf andere Verkehrsmittel ausweichen.",
+        "Die Gewerkschaft fordert höhere Löhne und kürzere Arbeitszeiten für das Zugpersonal.",
+        "Wirtschaftsverbände warnten vor Schäden für die ohnehin schwache Konjunktur.",
+        "Die Verhandlungen sollen nach Angaben beider Seiten in der kommenden Woche fortgesetzt werden.",
+    ]),
+    ("Länder fordern mehr Unterstützung bei der Aufnahme von Flüchtlingen", [
+        "Die Ministerpräsidenten der Länder haben vom Bund mehr Unterstützung bei der Aufnahme von Flüchtlingen gefordert.",
+        "Viele Kommunen seien an der Belastungsgrenze, hieß es nach dem Treffen in Berlin.",
+        "Nach Angaben des Bundesamts für Migration wurden im vergangenen Monat weniger Asylanträge gestellt als im Vorjahr.",
+        "Die Innenministerin kündigte an, die Grenzkontrollen zu verlängern.",
+        "Flüchtlingsorganisationen kritisierten die Debatte als einseitig.",
+    ]),
+    ("AfD-Verbotsverfahren: Bundestag debattiert Antrag", [
+        "Der Bundestag hat über einen fraktionsübergreifenden Antrag für ein Verbotsverfahren gegen die AfD debattiert.",
+        "Befürworter verwiesen auf die Einstufung durch den Verfassungsschutz.",
+        "Kritiker aus SPD und CDU warnten vor einem langwierigen Verfahren mit ungewissem Ausgang.",
+        "Eine Entscheidung über den Antrag wird erst nach der Sommerpause erwartet.",
+        "Die AfD sprach von einem Angriff auf die Opposition.",
+    ]),
+    ("Energiepreise: Regierung plant Entlastung für Industrie", [
+        "Die Bundesregierung plant eine Entlastung energieintensiver Unternehmen bei den Strompreisen.",
+        "Der Wirtschaftsminister sprach von einer Brücke, bis ausreichend erneuerbare Energie verfügbar sei.",
+        "Die EU-Kommission muss den Plänen wegen des Beihilferechts noch zustimmen.",
+        "Verbraucherschützer fordern, auch private Haushalte stärker zu entlasten.",
+        "Die Kosten sollen aus dem Klima- und Transformationsfonds bezahlt werden.",
+    ]),
+]
+
+TOPICS_EN = [
+    ("Germany tightens border controls amid migration debate", [
+        "Germany has extended controls at all of its land borders for another six months, the interior ministry in Berlin said.",
+        "The government argues the checks have reduced irregular migration, while neighbouring countries have voiced concern.",
+        "Refugee groups say asylum seekers are being turned back without proper review of their claims.",
+        "The opposition conservatives want even tougher measures, including rejecting migrants at the border.",
+        "The European Union is reviewing whether the prolonged controls comply with Schengen rules.",
+    ]),
+    ("Ceasefire talks resume as fighting continues", [
+        "Negotiators resumed ceasefire talks on Tuesday as fighting continued in several regions.",
+        "Mediators said progress had been made on humanitarian corridors but major issues remain unresolved.",
+        "Aid agencies warned of worsening conditions for civilians displaced by the war.",
+        "Both sides accused each other of violating earlier agreements.",
+        "Diplomats expect the talks to last at least another week.",
+    ]),
+]
+
+OFF_TOPIC_DE = [
+    ("Bundesliga: Spitzenspiel endet mit spätem Tor", [
+        "Im Spitzenspiel der Bundesliga hat ein spätes Tor die Entscheidung gebracht.",
+        "Der Trainer lobte nach dem Spiel die Moral seiner Mannschaft.",
+        "In der Tabelle bleibt der Verein damit auf dem zweiten Platz.",
+        "Am kommenden Spieltag wartet ein schweres Auswärtsspiel.",
+    ]),
+    ("Wetter: Unwetter und Regen am Wochenende", [
+        "Der Deutsche Wetterdienst warnt für das Wochenende vor Unwetter und starkem Regen.",
+        "Im Süden sind örtlich Gewitter mit Hagel möglich, im Norden bleibt es heiter.",
+        "Die Vorhersage für die kommende Woche verspricht wieder sonnige Tage.",
+        "Die Temperaturen steigen auf bis zu 28 Grad.",
+    ]),
+]
+
+FILLER_DE = [
+    "Nach Angaben von Beobachtern dürfte die Debatte in den kommenden Wochen weitergehen.",
+    "Eine Sprecherin des zuständigen Ministeriums wollte sich zu Details zunächst nicht äußern.",
+    "Experten rechnen damit, dass das Thema auch im Wahlkampf eine Rolle spielen wird.",
+    "In einer ersten Reaktion zeigten sich Vertreter der Kommunen zurückhaltend.",
+    "Die Zahlen beruhen auf vorläufigen Angaben und können sich noch ändern.",
+    "Bereits im vergangenen Jahr war über ähnliche Vorschläge gestritten worden.",
+]
+
+FILLER_EN = [
+    "Officials did not immediately respond to requests for comment.",
+    "Analysts say the issue is likely to dominate the political agenda in the coming weeks.",
+    "The figures are preliminary and may be revised.",
+]
+
+BOILERPLATE = '''<header class="site-header"><nav><ul><li><a href="/">Startseite</a></li><li><a href="/politik">Politik</a></li>
+<li><a href="/wirtschaft">Wirtschaft</a></li><li><a href="/sport">Sport</a></li></ul></nav></header>
+<div class="cookie-banner"><p>Wir verwenden Cookies, um Ihnen ein optimales Nutzungserlebnis zu bieten.</p><button>Akzeptieren</button></div>'''
+
+FOOTER = '''<aside class="related"><h2>Mehr zum Thema</h2><ul><li><a href="/a">Weitere Nachrichten aus Berlin</a></li>
+<li><a href="/b">Newsletter abonnieren</a></li></ul></aside>
+<footer class="site-footer"><p>© Alle Rechte vorbehalten · Impressum · Datenschutz · Kontakt</p></footer>'''
+
+# Разметка тела статьи, близкая к вёрстке каждого сайта
+SITE_TEMPLATES = {
+    "www.deutschlandfunk.de": ('<article class="b-article"><header class="b-article-header"><h1 class="headline-title">{title}</h1>'
+                               '<p class="article-header-description">{lead}</p></header>'
+                               '<div class="article-details-text u-richtext">{paragraphs}</div>'
+                               '<p class="article-details-text">Diese Nachricht wurde am {date} im Programm Deutschlandfunk gesendet.</p></article>',
+                               '<p>{}</p>'),
+    "www.tagesschau.de": ('<article class="container content-wrapper__group"><h1 class="seitenkopf__headline">{title}</h1>'
+                          '<p class="textabsatz m-ten m-offset-one l-eight l-offset-two columns twelve"><strong>{lead}</strong></p>'
+                          '{paragraphs}<div class="teaser-absatz">Mehr zum Thema</div></article>',
+                          '<p class="textabsatz m-ten m-offset-one l-eight l-offset-two columns twelve">{}</p>'),
+    "www.spiegel.de": ('<main id="Inhalt"><article aria-label="{title}"><header><h2><span class="align-middle">{title}</span></h2>'
+                       '<div class="RichText RichText--iconLinks lg:w-8/12 md:w-10/12 lg:mx-auto md:mx-auto lg:px-24 md:px-24 sm:px-16 break-words word-wrap"><strong>{lead}</strong></div></header>'
+                       '<section class="relative"><div data-sara-click-el="body_element" data-area="body">{paragraphs}</div></section></article></main>',
+                       '<div data-sara-click-el="body_element" class="RichText RichText--iconLinks lg:w-8/12 md:w-10/12 lg:mx-auto md:mx-auto lg:px-24 md:px-24 sm:px-16 break-words word-wrap"><p>{}</p></div>'),
+    "www.zeit.de": ('<main class="main"><article class="article" itemscope itemtype="http://schema.org/Article"><header class="article-header">'
+                    '<h1 class="article-heading"><span class="article-heading__title">{title}</span></h1><div class="summary">{lead}</div></header>'
+                    '<div class="article-body article-body--article"><div class="article-page">{paragraphs}</div></div></article></main>',
+                    '<p class="paragraph article__item">{}</p>'),
+    "www.tagesspiegel.de": ('<article><header><h1 class="Ha"><span class="Hl">{title}</span></h1><p class="Ka">{lead}</p></header>'
+                            '<div id="story-elements">{paragraphs}</div></article>',
+                            '<p>{}</p>'),
+    "www.faz.net": ('<article class="article"><div class="header-detail"><h1 class="header-title"><span class="header-title__title">{title}</span></h1>'
+                    '<p class="header-teaser">{lead}</p></div><div class="article-body">{paragraphs}</div></article>',
+                    '<div class="body-elements"><p class="body-elements__paragraph">{}</p></div>'),
+    "www.aljazeera.com": ('<main id="main-content-area"><header class="article-header"><h1>{title}</h1>'
+                          '<p class="article__subhead"><em>{lead}</em></p></header>'
+                          '<div class="wysiwyg wysiwyg--all-content css-ibbk12">{paragraphs}</div></main>',
+                          '<p>{}</p>'),
+}
+
+
+def slugify(text):
+    text = text.lower()
+    for a, b in (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")):
+        text = text.replace(a, b)
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-")
+
+
+def article_path(host, title, index):
+    slug = slugify(title)[:60]
+    if host == "www.deutschlandfunk.de":
+        return f"/{slug}-{100 + index}.html"
+    if host == "www.tagesschau.de":
+        return f"/inland/{slug}-{index}.html"
+    if host == "www.spiegel.de":
+        return f"/politik/deutschland/{slug}-a-{hashlib.md5(title.encode()).hexdigest()[:8]}"
+    if host == "www.zeit.de":
+        return f"/politik/deutschland/2025-01/{slug}"
+    if host == "www.tagesspiegel.de":
+        return f"/politik/{slug}-{10000000 + index}.html"
+    if host == "www.faz.net":
+        return f"/aktuell/politik/inland/{slug}-{110000000 + index}.html"
+    return f"/news/2025/1/{index}/{slug}"
+
+
+def render_article(host, title, sentences, rng):
+    template, paragraph = SITE_TEMPLATES[host]
+    filler = FILLER_EN if host == "www.aljazeera.com" else FILLER_DE
+    body = list(sentences[1:]) + rng.sample(filler, k=min(3, len(filler)))
+    paragraphs = "".join(paragraph.format(" ".join(body[i:i + 2])) for i in range(0, len(body), 2))
+    content = template.format(title=title, lead=sentences[0], paragraphs=paragraphs, date="15.01.2025")
+    return (f'<!DOCTYPE html><html lang="de"><head><meta charset="utf-8"><title>{title}</title>'
+            f'<meta name="description" content="{sentences[0]}"></head><body>{BOILERPLATE}{content}{FOOTER}</body></html>')
+
+
+def render_feed(feed_url, items):
+    entries = []
+    for item in items:
+        entries.append(
+            f"<item><title>{item['title']}</title><link>{item['link']}</link>"
+            f"<description>{item['description']}</description><pubDate>{item['pubDate']}</pubDate>"
+            f"<guid>{item['link']}</guid></item>"
+        )
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel><title>{feed_url}</title>'
+            f'<link>{feed_url}</link><description>Fixture</description>{"".join(entries)}</channel></rss>\n')
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(content)
+
+
+def generate():
+    """Детерминированные фикстуры: по ITEMS_PER_FEED статей на ленту, с копиями и нерелевантными темами"""
+    rng = random.Random(42)
+    base_time = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+    index = {}
+    counter = 0
+    for feed_number, (feed_url, (slug, host)) in enumerate(FEED_FIXTURES.items()):
+        topics = TOPICS_EN if host == "www.aljazeera.com" else TOPICS_DE
+        items = []
+        for i in range(ITEMS_PER_FEED):
+            counter += 1
+            if i == ITEMS_PER_FEED - 1 and host != "www.aljazeera.com":
+                title, sentences = OFF_TOPIC_DE[feed_number % len(OFF_TOPIC_DE)]
+            else:
+                # Один и тот же сюжет агентства встречается в нескольких лентах
+                title, sentences = topics[(feed_number + i) % len(topics)]
+            title = f"{title} ({slug} {i + 1})" if i else title
+            path = article_path(host, title, counter)
+            link = f"https://{host}{path}"
+            write(os.path.join(FIXTURES_DIR, "articles", host, path.strip("/").replace("/", "__")),
+                  render_article(host, title, sentences, rng))
+            items.append({
+                "title": title,
+                "link": link,
+                "description": sentences[0],
+                "pubDate": format_datetime(base_time - timedelta(minutes=15 * i + feed_number)),
+            })
+        write(os.path.join(FIXTURES_DIR, "feeds", f"{slug}.xml"), render_feed(feed_url, items))
+        index[feed_url] = f"feeds/{slug}.xml"
+    write(os.path.join(FIXTURES_DIR, "index.json"), json.dumps(index, indent=2) + "\n")
+    print(f"Фикстуры записаны в {FIXTURES_DIR}: лент {len(index)}, статей {counter}")
+
+
+def record():
+    """Записывает живые ленты и первые статьи каждой ленты (заменяет сгенерированные фикстуры)"""
+    import feedparser
+    import requests
+
+    session = requests.Session()
+    session.headers["User-Agent"] = "Mozilla/5.0 (compatible; SmartBot-bench/1.0)"
+    index = {}
+    for feed_url, (slug, _) in FEED_FIXTURES.items():
+        response = session.get(feed_url, timeout=20)
+        response.raise_for_status()
+        write(os.path.join(FIXTURES_DIR, "feeds", f"{slug}.xml"), response.content)
+        index[feed_url] = f"feeds/{slug}.xml"
+        for entry in feedparser.parse(response.content).entries[:RECORD_ARTICLES_PER_FEED]:
+            parsed = urlparse(entry.link)
+            try:
+                page = session.get(entry.link, timeout=20)
+                page.raise_for_status()
+            except Exception as e:
+                print(f"⚠ {entry.link}: {e}")
+                continue
+            write(os.path.join(FIXTURES_DIR, "articles", parsed.netloc, parsed.path.strip("/").replace("/", "__")), page.content)
+        print(f"📥 {feed_url}")
+    write(os.path.join(FIXTURES_DIR, "index.json"), json.dumps(index, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="записать живые ленты и статьи вместо генерации")
+    args = parser.parse_args()
+    record() if args.record else generate()
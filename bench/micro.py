@@ -0,0 +1,110 @@
+"""
+Микробенчмарки горячих функций фильтрации на истории разного размера.
+
+    python bench/micro.py                     # размеры 1k, 10k, 100k
+    python bench/micro.py --sizes 1000 50000 --repeat 500
+
+Для каждого размера истории замеряется среднее время одного вызова:
+normalize_text, is_duplicate_content (промах и почти-дубликат),
+KeywordMatcher.match и prefilter_entry. История заполняется синтетическими
+отпечатками, тексты берутся из bench/fixtures.
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from glob import glob
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def load_texts():
+    """Тексты статей из фикстур с грубо удалённой разметкой"""
+    texts = []
+    for path in sorted(glob(os.path.join(BENCH_DIR, "fixtures", "articles", "*", "*"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        text = re.sub(r"<[^>]+>", "\n", html)
+        texts.append(re.sub(r"\n\s*\n+", "\n", text).strip())
+    if not texts:
+        sys.exit("Нет фикстур: сначала запустите python bench/make_fixtures.py")
+    return texts
+
+
+def build_history(size, rng):
+    """SentIndex на size записей со случайными URL, хешами и SimHash-отпечатками"""
+    from sent_index import SentIndex
+    sent = SentIndex(size)
+    for i in range(size):
+        sent.add(
+            url=f"https://example.org/article-{i}",
+            title=f"Artikel {i}",
+            hash_=f"{rng.getrandbits(128):032x}",
+            content_hash=f"{rng.getrandbits(128):032x}",
+            simhash=rng.getrandbits(64),
+        )
+    return sent
+
+
+def measure(func, repeat):
+    """Среднее время вызова в микросекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="размеры истории")
+    parser.add_argument("--repeat", type=int, default=200, help="вызовов на замер")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smartbot-micro-") # news_bot создаёт bot-state в текущем каталоге
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    os.chdir(workdir)
+    import feedparser
+    import news_bot
+
+    rng = random.Random(7)
+    texts = load_texts()
+    matcher = news_bot.get_keyword_matcher()
+    entries = [feedparser.FeedParserDict(link=f"https://example.org/new-{i}", title=text.splitlines()[0], summary=text[:300])
+               for i, text in enumerate(texts)]
+    feed_url = news_bot.FEEDS[0]
+
+    print(f"{'история':>9}  {'функция':<34}{'мкс/вызов':>12}")
+    for size in args.sizes:
+        sent = build_history(size, rng)
+        # Почти-дубликат: отпечаток одной из статей, внесённый в историю
+        known = texts[0]
+        sent.add(url="https://example.org/known", title="known", hash_="0" * 32,
+                 content_hash=news_bot.get_content_hash("x" + known), simhash=news_bot.get_text_simhash(known))
+        probe = iter(range(10 ** 9))
+        cases = [
+            ("normalize_text", lambda: news_bot.normalize_text(texts[next(probe) % len(texts)])),
+            ("is_duplicate_content (новая)", lambda: news_bot.is_duplicate_content(texts[1 + next(probe) % (len(texts) - 1)], sent)),
+            ("is_duplicate_content (копия)", lambda: news_bot.is_duplicate_content(known, sent)),
+            ("KeywordMatcher.match", lambda: matcher.match(texts[next(probe) % len(texts)])),
+            ("prefilter_entry", lambda: news_bot.prefilter_entry(feed_url, entries[next(probe) % len(entries)], sent)),
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings = [(name, measure(func, args.repeat)) for name, func in cases]
+        for name, micros in timings:
+            print(f"{size:>9}  {name:<34}{micros:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Офлайн-прогон main() по записанным лентам и статьям через стаб-сервер.
+
+    python bench/replay.py                       # все сценарии
+    python bench/replay.py cold rate_limited     # выбранные сценарии
+    python bench/replay.py --json results.json   # сохранить результаты
+    python bench/replay.py --production-limits   # реальные лимиты LLM и Telegram
+
+Каждый сценарий запускается в отдельном процессе с чистым каталогом состояния
+(bot-state создаётся во временной папке), чтобы глобальные кэши модуля не
+переживали сценарий. Сетевые запросы бота уходят на стаб-сервер через
+RedirectAdapter, внешние сервисы не используются.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubConfig, StubServer, redirect_session
+
+# Сценарий: параметры стабов, число последовательных запусков main() в одном каталоге
+# (в отчёт идёт последний запуск) и дополнительные переменные окружения бота
+SCENARIOS = {
+    "cold": {
+        "description": "пустое состояние, быстрые LLM и Telegram",
+        "config": StubConfig(article_latency=0.05, llm_latency=0.2, telegram_latency=0.02),
+        "runs": 1,
+    },
+    "warm_noop": {
+        "description": "повторный запуск: все ленты отвечают 304",
+        "config": StubConfig(article_latency=0.05, llm_latency=0.2, telegram_latency=0.02),
+        "runs": 2,
+    },
+    "slow_llm": {
+        "description": "LLM отвечает 2 секунды",
+        "config": StubConfig(article_latency=0.05, llm_latency=2.0, telegram_latency=0.02),
+        "runs": 1,
+    },
+    "rate_limited": {
+        "description": "каждый 3-й запрос к LLM и 4-й к Telegram получает 429",
+        "config": StubConfig(article_latency=0.05, llm_latency=0.2, telegram_latency=0.02,
+                             llm_429_every=3, telegram_429_every=4, retry_after=1),
+        "runs": 1,
+    },
+    "budget_deferred": {
+        "description": "не больше 3 сообщений за проход; второй проход дорабатывает отложенное при 304",
+        "config": StubConfig(article_latency=0.05, llm_latency=0.2, telegram_latency=0.02),
+        "runs": 2,
+        "env": {"RUN_MAX_MESSAGES": "3"},
+    },
+}
+
+# Без --production-limits лимиты частоты отключены: измеряется сам конвейер, а не паузы
+BENCH_ENV = {
+    "OPENROUTER_API_KEY": "bench",
+    "BOT_TOKEN": "bench",
+    "CHAT_ID": "1",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "TELEGRAM_MIN_INTERVAL": "0",
+}
+
+
+def stub_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats/", timeout=5) as response:
+        return json.load(response)
+
+
+def run_child(workdir, port, runs, result_path):
+    """Выполняется в дочернем процессе: запускает main() runs раз в workdir"""
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    import news_bot
+    from metrics import METRICS
+
+    redirect_session(news_bot.get_http_session(), port,
+                     pool_size=max(news_bot.FEED_WORKERS, news_bot.ARTICLE_IO_WORKERS, news_bot.LLM_CONCURRENCY))
+    results = []
+    for _ in range(runs):
+        METRICS.reset()
+        before = stub_stats(port)
+        started = time.perf_counter()
+        news_bot.main()
+        wall = time.perf_counter() - started
+        after = stub_stats(port)
+        results.append({
+            "wall": wall,
+            "metrics": METRICS.snapshot(),
+            "stub": {key: after[key] - before.get(key, 0) for key in after},
+        })
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+def run_scenario(server, name, scenario, production_limits, verbose):
+    server.state.config = scenario["config"]
+    with tempfile.TemporaryDirectory(prefix=f"smartbot-bench-{name}-") as workdir:
+        result_path = os.path.join(workdir, "result.json")
+        env = dict(os.environ, **BENCH_ENV, **scenario.get("env", {}))
+        if production_limits:
+            env.pop("LLM_REQUESTS_PER_MINUTE")
+            env.pop("TELEGRAM_MIN_INTERVAL")
+        command = [sys.executable, os.path.abspath(__file__), "--child", workdir, str(server.port),
+                   str(scenario["runs"]), result_path]
+        with open(os.path.join(workdir, "bot.log"), "w", encoding="utf-8") as log:
+            code = subprocess.call(command, env=env, stdout=None if verbose else log, stderr=subprocess.STDOUT)
+        if code != 0:
+            with open(os.path.join(workdir, "bot.log"), "r", encoding="utf-8") as log:
+                print(log.read()[-4000:])
+            raise RuntimeError(f"сценарий {name} завершился с кодом {code}")
+        with open(result_path, "r", encoding="utf-8") as f:
+            runs = json.load(f)
+    last = runs[-1]
+    counters = last["metrics"]["counters"]
+    sent = counters.get("articles_sent", {}).get("total", 0)
+    return {
+        "scenario": name,
+        "description": scenario["description"],
+        "wall": round(last["wall"], 3),
+        "candidates": counters.get("candidates", {}).get("total", 0),
+        "sent": sent,
+        "articles_per_second": round(sent / last["wall"], 2) if last["wall"] else 0,
+        "stub": last["stub"],
+        "stages": {stage: hist["sum"] for stage, hist in last["metrics"]["stages"].items()},
+    }
+
+
+def print_table(results):
+    header = f"{'сценарий':<14}{'время, с':>10}{'кандидатов':>12}{'отправлено':>12}{'статей/с':>10}{'LLM':>6}{'429':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        stub = r["stub"]
+        print(f"{r['scenario']:<14}{r['wall']:>10.2f}{r['candidates']:>12}{r['sent']:>12}{r['articles_per_second']:>10.2f}"
+              f"{stub.get('llm_requests', 0):>6}{stub.get('llm_429', 0) + stub.get('telegram_429', 0):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument("--json", metavar="PATH", help="записать результаты в JSON")
+    parser.add_argument("--production-limits", action="store_true",
+                        help="не отключать LLM_REQUESTS_PER_MINUTE и TELEGRAM_MIN_INTERVAL")
+    parser.add_argument("--verbose", action="store_true", help="показывать вывод бота")
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        workdir, port, runs, result_path = args.child
+        return run_child(workdir, int(port), int(runs), result_path)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    results = []
+    with StubServer() as server:
+        for name in args.scenarios or SCENARIOS:
+            print(f"▶ {name}: {SCENARIOS[name]['description']}")
+            results.append(run_scenario(server, name, SCENARIOS[name], args.production_limits, args.verbose))
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n📈 Результаты сохранены: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
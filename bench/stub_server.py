@@ -0,0 +1,312 @@
+"""
+Локальный стаб-сервер для офлайн-бенчмарков.
+
+Отдаёт ленты и статьи из bench/fixtures и имитирует внешние API:
+OpenRouter (chat/completions) и Telegram (sendMessage, sendDocument,
+getFile, скачивание файла). Пути имеют вид /<host>/<path> — бот ходит по
+оригинальным URL, а RedirectAdapter переписывает https://host/path на
+http://127.0.0.1:<port>/host/path.
+
+    python bench/stub_server.py --port 8765 --llm-latency 0.5 --llm-429-every 3
+
+Задержки и частота ответов 429 меняются на лету через StubConfig.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from requests.adapters import HTTPAdapter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+OPENROUTER_HOST = "openrouter.ai"
+TELEGRAM_HOST = "api.telegram.org"
+FRESHEST_ENTRY_AGE = 300 # секунд: самая свежая запись ленты «опубликована» 5 минут назад
+
+PUB_DATE = re.compile(rb"<pubDate>(.*?)</pubDate>", re.DOTALL)
+
+
+class StubConfig:
+    """Параметры поведения стабов: задержки в секундах и каждый N-й ответ 429 (0 — без 429)"""
+
+    def __init__(self, feed_latency=0.0, article_latency=0.0, llm_latency=0.0, telegram_latency=0.0,
+                 llm_429_every=0, telegram_429_every=0, retry_after=1):
+        self.feed_latency = feed_latency
+        self.article_latency = article_latency
+        self.llm_latency = llm_latency
+        self.telegram_latency = telegram_latency
+        self.llm_429_every = llm_429_every
+        self.telegram_429_every = telegram_429_every
+        self.retry_after = retry_after
+
+
+class StubState:
+    """Фикстуры в памяти, загруженные документы Telegram и счётчики запросов"""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, config=None):
+        self.config = config or StubConfig()
+        self.fixtures_dir = fixtures_dir
+        self.feeds = {}
+        self.documents = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        with open(os.path.join(fixtures_dir, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        for feed_url, path in index.items():
+            with open(os.path.join(fixtures_dir, path), "rb") as f:
+                body = shift_pub_dates(f.read())
+            parsed = urlparse(feed_url)
+            self.feeds[parsed.netloc + parsed.path] = (body, '"%s"' % hashlib.md5(body).hexdigest())
+
+    def count(self, name):
+        """Увеличивает счётчик и возвращает его новое значение"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return self.counters[name]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.documents = {}
+
+    def article(self, host, path):
+        name = path.strip("/").replace("/", "__")
+        file_path = os.path.join(self.fixtures_dir, "articles", host, name)
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, "rb") as f:
+            return f.read()
+
+
+def shift_pub_dates(body):
+    """Сдвигает pubDate ленты так, чтобы самая свежая запись была опубликована недавно"""
+    dates = []
+    for match in PUB_DATE.finditer(body):
+        try:
+            dates.append(parsedate_to_datetime(match.group(1).decode().strip()))
+        except (TypeError, ValueError):
+            continue
+    if not dates:
+        return body
+    offset = datetime.now(timezone.utc).timestamp() - FRESHEST_ENTRY_AGE - max(d.timestamp() for d in dates)
+
+    def replace(match):
+        try:
+            published = parsedate_to_datetime(match.group(1).decode().strip()).timestamp() + offset
+        except (TypeError, ValueError):
+            return match.group(0)
+        shifted = format_datetime(datetime.fromtimestamp(published, timezone.utc))
+        return b"<pubDate>" + shifted.encode() + b"</pubDate>"
+
+    return PUB_DATE.sub(replace, body)
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def split_path(self):
+            parsed = urlparse(self.path)
+            host, _, path = parsed.path.lstrip("/").partition("/")
+            return host, "/" + path, parse_qs(parsed.query)
+
+        def read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def respond(self, status, body=b"", content_type="application/json", headers=None):
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_GET(self):
+            host, path, query = self.split_path()
+            if host == TELEGRAM_HOST:
+                return self.telegram(path, query, b"")
+            if host == "_stats":
+                return self.respond(200, state.stats())
+            feed = state.feeds.get(host + path)
+            if feed is not None:
+                return self.feed(*feed)
+            html = state.article(host, path)
+            if html is None:
+                state.count("not_found")
+                return self.respond(404, b"not found", "text/plain")
+            state.count("articles")
+            time.sleep(state.config.article_latency)
+            self.respond(200, html, "text/html; charset=utf-8")
+
+        def do_POST(self):
+            host, path, query = self.split_path()
+            body = self.read_body()
+            if host == OPENROUTER_HOST:
+                return self.chat_completion(body)
+            if host == TELEGRAM_HOST:
+                return self.telegram(path, query, body)
+            self.respond(404, b"not found", "text/plain")
+
+        def feed(self, body, etag):
+            time.sleep(state.config.feed_latency)
+            if self.headers.get("If-None-Match") == etag:
+                state.count("feeds_not_modified")
+                return self.respond(304, headers={"ETag": etag})
+            state.count("feeds")
+            self.respond(200, body, "application/rss+xml; charset=utf-8", {"ETag": etag})
+
+        def chat_completion(self, body):
+            number = state.count("llm_requests")
+            time.sleep(state.config.llm_latency)
+            every = state.config.llm_429_every
+            if every and number % every == 0:
+                state.count("llm_429")
+                return self.respond(429, {"error": {"message": "Rate limit exceeded"}},
+                                    headers={"Retry-After": str(state.config.retry_after)})
+            prompt = json.loads(body or b"{}").get("messages", [{}])[-1].get("content", "")
+            words = prompt.split()
+            summary = "Zusammenfassung: " + " ".join(words[-60:])
+            self.respond(200, {
+                "id": f"stub-{number}",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": summary}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(words), "completion_tokens": 60, "total_tokens": len(words) + 60},
+            })
+
+        def telegram(self, path, query, body):
+            time.sleep(state.config.telegram_latency)
+            if path.startswith("/file/"):
+                data = state.documents.get(path.rsplit("/", 1)[-1])
+                if data is None:
+                    return self.respond(404, b"not found", "text/plain")
+                state.count("telegram_downloads")
+                return self.respond(200, data, "application/octet-stream")
+            method = path.rsplit("/", 1)[-1]
+            if method == "sendMessage":
+                number = state.count("telegram_requests")
+                every = state.config.telegram_429_every
+                if every and number % every == 0:
+                    state.count("telegram_429")
+                    retry_after = state.config.retry_after
+                    return self.respond(429, {"ok": False, "error_code": 429,
+                                              "description": f"Too Many Requests: retry after {retry_after}",
+                                              "parameters": {"retry_after": retry_after}})
+                message_id = state.count("telegram_messages")
+                return self.respond(200, {"ok": True, "result": {"message_id": message_id}})
+            if method == "sendDocument":
+                file_id = f"stub-file-{state.count('telegram_documents')}"
+                # Тело multipart хранится целиком: извлекаем содержимое файла между границами
+                state.documents[file_id] = extract_multipart_file(body, self.headers.get("Content-Type", ""))
+                return self.respond(200, {"ok": True, "result": {"document": {"file_id": file_id}}})
+            if method == "getFile":
+                file_id = (query.get("file_id") or [""])[0]
+                if file_id not in state.documents:
+                    return self.respond(400, {"ok": False, "description": "Bad Request: invalid file_id"})
+                return self.respond(200, {"ok": True, "result": {"file_id": file_id, "file_path": f"documents/{file_id}"}})
+            self.respond(404, {"ok": False, "description": "Not Found"})
+
+    return StubHandler
+
+
+def extract_multipart_file(body, content_type):
+    """Возвращает содержимое части multipart/form-data с именем document"""
+    boundary = content_type.partition("boundary=")[2].strip('"').encode()
+    if not boundary:
+        return body
+    for part in body.split(b"--" + boundary):
+        headers, _, content = part.partition(b"\r\n\r\n")
+        if b'name="document"' in headers:
+            return content[:-2] if content.endswith(b"\r\n") else content
+    return b""
+
+
+class StubServer:
+    """Стаб-сервер в фоновом потоке: with StubServer() as stub: ..."""
+
+    def __init__(self, port=0, fixtures_dir=FIXTURES_DIR, config=None):
+        self.state = StubState(fixtures_dir, config)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = None
+
+    @property
+    def config(self):
+        return self.state.config
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Транспорт requests, который отправляет все запросы на стаб-сервер, сохраняя хост в пути"""
+
+    def __init__(self, port, **kwargs):
+        self.base = f"http://127.0.0.1:{port}"
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        if parsed.hostname != "127.0.0.1":
+            request.url = f"{self.base}/{parsed.netloc}{parsed.path}" + (f"?{parsed.query}" if parsed.query else "")
+        return super().send(request, **kwargs)
+
+
+def redirect_session(session, port, pool_size=10):
+    """Подключает RedirectAdapter к сессии вместо обычных адаптеров"""
+    adapter = RedirectAdapter(port, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--feed-latency", type=float, default=0.0)
+    parser.add_argument("--article-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument("--llm-429-every", type=int, default=0)
+    parser.add_argument("--telegram-429-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    config = StubConfig(args.feed_latency, args.article_latency, args.llm_latency, args.telegram_latency,
+                        args.llm_429_every, args.telegram_429_every, args.retry_after)
+    server = StubServer(args.port, config=config)
+    print(f"🧪 Стаб-сервер слушает http://127.0.0.1:{server.port}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
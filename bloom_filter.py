@@ -0,0 +1,126 @@
+"""Компактный фильтр Блума с поколениями и версионированным бинарным форматом."""
+
+import hashlib
+import math
+import struct
+
+FILE_MAGIC = b"SBBF"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct(">4sBB") # магия, версия, число поколений
+GENERATION_HEADER = struct.Struct(">IIdBI") # capacity, count, error_rate, число хешей, число бит
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на capacity элементов с заданной вероятностью ложного срабатывания.
+    Позиции битов получаются двойным хешированием одного 128-битного blake2b.
+    """
+
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits or max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        """Добавляет значение; возвращает False, если оно (вероятно) уже было"""
+        added = False
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] >> bit & 1:
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] >> (position % 8) & 1 for position in self._positions(value))
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def __len__(self):
+        return self.count
+
+
+class RotatingBloomFilter:
+    """
+    Несколько поколений фильтров Блума: новые значения пишутся в последнее,
+    проверка идёт по всем. Когда последнее поколение заполнено до capacity,
+    начинается новое, а самое старое удаляется — память ограничена, а горизонт
+    не меньше capacity * (generations - 1) значений.
+    """
+
+    def __init__(self, capacity, error_rate, generations=2):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.generations = generations
+        self._filters = [BloomFilter(capacity, error_rate)]
+        self.dirty = False
+
+    def add(self, value):
+        """
+        Добавляет значение в последнее поколение. Совпадение в старых поколениях
+        не мешает добавлению: оно может быть ложным, а старое поколение уйдёт при ротации.
+        """
+        if not value or value in self._filters[-1]:
+            return False
+        if self._filters[-1].is_full():
+            self._filters.append(BloomFilter(self.capacity, self.error_rate))
+            del self._filters[:-self.generations]
+        self._filters[-1].add(value)
+        self.dirty = True
+        return True
+
+    def __contains__(self, value):
+        return bool(value) and any(value in bloom for bloom in self._filters)
+
+    def __len__(self):
+        return sum(len(bloom) for bloom in self._filters)
+
+    def size_bytes(self):
+        return sum(len(bloom.bits) for bloom in self._filters)
+
+    def to_bytes(self):
+        """Бинарный формат: заголовок файла, затем для каждого поколения заголовок и биты"""
+        parts = [FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(self._filters))]
+        for bloom in self._filters:
+            parts.append(GENERATION_HEADER.pack(bloom.capacity, bloom.count, bloom.error_rate, bloom.num_hashes, bloom.num_bits))
+            parts.append(bytes(bloom.bits))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, raw, capacity, error_rate, generations=2):
+        """
+        Загружает фильтр из to_bytes(). Сохранённые поколения сохраняют свои
+        параметры; новые поколения создаются с переданными capacity и error_rate.
+        """
+        magic, version, count = FILE_HEADER.unpack_from(raw, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError("не файл фильтра Блума")
+        if version > FILE_VERSION:
+            raise ValueError(f"неизвестная версия фильтра Блума: {version}")
+        instance = cls(capacity, error_rate, generations)
+        filters = []
+        offset = FILE_HEADER.size
+        for _ in range(count):
+            bloom_capacity, bloom_count, bloom_error_rate, num_hashes, num_bits = GENERATION_HEADER.unpack_from(raw, offset)
+            offset += GENERATION_HEADER.size
+            size = (num_bits + 7) // 8
+            bits = bytearray(raw[offset:offset + size])
+            if len(bits) != size:
+                raise ValueError("файл фильтра Блума обрезан")
+            offset += size
+            filters.append(BloomFilter(bloom_capacity, bloom_error_rate, num_bits, num_hashes, bits, bloom_count))
+        if filters:
+            instance._filters = filters[-generations:]
+        return instance
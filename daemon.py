@@ -0,0 +1,134 @@
+"""
+Постоянно работающий режим бота: история, HTTP-сессии и клиенты живут в памяти,
+каждая лента опрашивается по своему расписанию, которое подстраивается
+под частоту публикаций. Состояние бота отдаётся через keep_alive (/health),
+накопленные метрики — в формате Prometheus (/metrics).
+"""
+
+import signal
+import threading
+import time
+from datetime import datetime
+
+import news_bot
+from keep_alive import keep_alive
+
+MIN_POLL_INTERVAL = 120 # секунд; часто обновляемые ленты
+MAX_POLL_INTERVAL = 1800 # секунд; ленты без новых записей
+DEFAULT_POLL_INTERVAL = 300
+POLL_SPEEDUP = 0.5 # множитель интервала, если появились новые записи
+POLL_SLOWDOWN = 1.5 # множитель интервала, если новых записей нет
+SNAPSHOT_INTERVAL = 1800 # как часто сохранять снимок истории в Telegram
+IDLE_SLEEP = 5 # максимальный шаг ожидания между проверками расписания
+
+
+class FeedScheduler:
+    """Хранит для каждой ленты интервал опроса и время следующего опроса"""
+
+    def __init__(self, feed_urls):
+        now = time.time()
+        self.feeds = {
+            url: {"interval": DEFAULT_POLL_INTERVAL, "next_poll": now, "last_poll": None, "new_items": 0}
+            for url in feed_urls
+        }
+        self._seen_links = {url: None for url in feed_urls}
+
+    def due_feeds(self, now=None):
+        now = now or time.time()
+        return [url for url, state in self.feeds.items() if state["next_poll"] <= now]
+
+    def seconds_until_next(self, now=None):
+        now = now or time.time()
+        return max(0.0, min(state["next_poll"] for state in self.feeds.values()) - now)
+
+    def record_poll(self, feed_url, links, now=None):
+        """Пересчитывает интервал ленты по числу записей, которых не было в прошлый раз"""
+        now = now or time.time()
+        state = self.feeds[feed_url]
+        links = {link for link in links or [] if link}
+        previous = self._seen_links.get(feed_url)
+        new_items = len(links - previous) if previous is not None else 0
+        if links:
+            self._seen_links[feed_url] = links
+        if new_items:
+            state["interval"] = max(MIN_POLL_INTERVAL, state["interval"] * POLL_SPEEDUP)
+        else:
+            state["interval"] = min(MAX_POLL_INTERVAL, state["interval"] * POLL_SLOWDOWN)
+        state["new_items"] = new_items
+        state["last_poll"] = now
+        state["next_poll"] = now + state["interval"]
+
+    def status(self):
+        return {
+            url: {
+                "interval": round(state["interval"]),
+                "next_poll_in": round(max(0.0, state["next_poll"] - time.time())),
+                "last_poll": state["last_poll"],
+                "new_items": state["new_items"],
+            }
+            for url, state in self.feeds.items()
+        }
+
+
+def run_daemon():
+    print("\n" + "="*50)
+    print("🚀 ЗАПУСК БОТА В ПОСТОЯННОМ РЕЖИМЕ")
+    print("="*50)
+
+    sent, _ = news_bot.load_sent_articles()
+    rejections = news_bot.load_rejection_cache()
+    feed_cache = news_bot.load_feed_cache()
+    deferred = news_bot.load_deferred()
+    scheduler = FeedScheduler(news_bot.FEEDS)
+    stop = threading.Event()
+    status = {"started": datetime.utcnow().isoformat(), "cycles": 0, "last_cycle": None, "last_error": None}
+
+    def health():
+        return {**status, "sent": sent.counts(), "deferred": len(deferred), "feeds": scheduler.status()}
+
+    def shutdown(signum, frame):
+        print(f"🛑 Получен сигнал {signum}, завершаем работу...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    keep_alive(health)
+
+    last_snapshot = time.time()
+    while not stop.is_set():
+        due = scheduler.due_feeds()
+        if due:
+            started = time.time()
+            try:
+                fetched = news_bot.fetch_feeds(due, feed_cache)
+                if fetched or deferred:
+                    feed_links = news_bot.run_cycle(sent, fetched, rejections, feed_cache, deferred)
+                else:
+                    feed_links = {}
+                news_bot.save_feed_cache(feed_cache)
+                news_bot.save_rejection_cache(rejections)
+                news_bot.save_deferred(deferred)
+                news_bot.METRICS.write_report(news_bot.RUN_REPORT_FILE)
+                status["last_error"] = None
+            except Exception as e:
+                print(f"⚠ Ошибка в цикле опроса: {e}")
+                feed_links = {}
+                status["last_error"] = str(e)
+            for feed_url in due:
+                scheduler.record_poll(feed_url, feed_links.get(feed_url))
+            status["cycles"] += 1
+            status["last_cycle"] = {"feeds": len(due), "seconds": round(time.time() - started, 1), "at": int(started)}
+
+        if time.time() - last_snapshot >= SNAPSHOT_INTERVAL:
+            news_bot.save_sent_articles(sent, news_bot.generate_filename())
+            last_snapshot = time.time()
+
+        stop.wait(min(IDLE_SLEEP, scheduler.seconds_until_next()))
+
+    news_bot.save_rejection_cache(rejections)
+    news_bot.save_sent_articles(sent, news_bot.generate_filename())
+    print("🏁 Бот остановлен")
+
+
+if __name__ == "__main__":
+    run_daemon()
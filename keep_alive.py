@@ -1,14 +1,28 @@
-from flask import Flask, request
+from flask import Flask, Response, jsonify, request
 from threading import Thread
 from datetime import datetime
+from metrics import METRICS
 
 app = Flask('')
 
+_status_provider = None
+
 @app.route('/')
 def home():
     print(f"[{datetime.utcnow()}] Ping received from UptimeRobot — IP: {request.remote_addr}")
     return "✅ Bot läuft. Ping OK."
 
-def keep_alive():
-    t = Thread(target=lambda: app.run(host='0.0.0.0', port=8080))
+@app.route('/health')
+def health():
+    status = _status_provider() if _status_provider else {}
+    return jsonify({"ok": True, **status})
+
+@app.route('/metrics')
+def metrics():
+    return Response(METRICS.prometheus(), mimetype="text/plain; version=0.0.4")
+
+def keep_alive(status_provider=None):
+    global _status_provider
+    _status_provider = status_provider
+    t = Thread(target=lambda: app.run(host='0.0.0.0', port=8080), daemon=True)
     t.start()
@@ -0,0 +1,74 @@
+"""Скомпилированный поиск ключевых и блокирующих слов за один проход по тексту."""
+
+import math
+import re
+from collections import Counter, namedtuple
+
+KeywordMatch = namedtuple("KeywordMatch", ["relevant", "blocked", "score"])
+
+
+def term_pattern(term):
+    """
+    Регулярное выражение для одного термина. По умолчанию ищется целое слово
+    ("tor" не совпадает с "Motor"). "*" в конце — префикс ("asyl*" → "Asylantrag"),
+    "*" в начале — окончание составного слова ("*wahl" → "Bundestagswahl").
+    """
+    prefix = term.startswith("*")
+    suffix = term.endswith("*")
+    core = term.strip("*")
+    pattern = r"\s+".join(re.escape(part) for part in core.split())
+    if prefix:
+        pattern = r"\w*" + pattern
+    if suffix:
+        pattern += r"\w*"
+    return pattern
+
+
+class KeywordMatcher:
+    """
+    Компилирует ключевые и блокирующие слова в одно регулярное выражение
+    с границами слов. Текст приводится к нижнему регистру один раз,
+    все совпадения обоих списков находятся за один проход.
+    """
+
+    def __init__(self, keywords, blocked_keywords=()):
+        self._terms = []
+        for category, terms in (("relevant", keywords), ("blocked", blocked_keywords)):
+            for term in terms:
+                term = term.lower().strip()
+                if term:
+                    self._terms.append((term, category, re.compile(term_pattern(term))))
+        # Длинные термины первыми, чтобы "champions league" не уступал "league"
+        ordered = sorted({term for term, _, _ in self._terms}, key=lambda t: len(t.strip("*")), reverse=True)
+        self._exact = {term: category for term, category, _ in self._terms if "*" not in term}
+        self._wildcards = [(term, category, regex) for term, category, regex in self._terms if "*" in term]
+        if ordered:
+            self._regex = re.compile(r"(?<!\w)(?:" + "|".join(term_pattern(t) for t in ordered) + r")(?!\w)")
+        else:
+            self._regex = None
+
+    def _resolve(self, found):
+        """Определяет, какому термину соответствует найденный фрагмент"""
+        normalized = " ".join(found.split())
+        if normalized in self._exact:
+            return normalized, self._exact[normalized]
+        for term, category, regex in self._wildcards:
+            if regex.fullmatch(found):
+                return term, category
+        return None, None
+
+    def match(self, text, lowered=False):
+        """Возвращает KeywordMatch с найденными терминами и оценкой релевантности"""
+        relevant = Counter()
+        blocked = Counter()
+        if text and self._regex is not None:
+            if not lowered:
+                text = text.lower()
+            for found in self._regex.finditer(text):
+                term, category = self._resolve(found.group(0))
+                if category == "relevant":
+                    relevant[term] += 1
+                elif category == "blocked":
+                    blocked[term] += 1
+        score = round(sum(1 + math.log(count) for count in relevant.values()), 2)
+        return KeywordMatch(dict(relevant), dict(blocked), score)
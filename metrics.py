@@ -0,0 +1,125 @@
+"""Лёгкая инструментация конвейера: гистограммы задержек по этапам и счётчики."""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = "smartbot"
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин (как histogram в Prometheus)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "avg": round(self.sum / self.count, 4) if self.count else 0,
+            "max": round(self.max, 4),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class Metrics:
+    """
+    Потокобезопасный набор метрик: задержки этапов (stage), счётчики с метками
+    (inc) и отчёт в JSON или текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._stages = {}
+            self._counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = Histogram()
+            self._stages[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Замеряет длительность блока: with METRICS.stage("summarize"): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": int(self.started),
+                "duration": round(time.time() - self.started, 3),
+                "stages": {name: hist.to_dict() for name, hist in self._stages.items()},
+                "counters": {
+                    name: {format_labels(key) or "total": value for key, value in values.items()}
+                    for name, values in self._counters.items()
+                },
+            }
+
+    def write_report(self, path):
+        """Сохраняет отчёт о запуске в JSON"""
+        report = self.snapshot()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"📈 Отчёт о запуске сохранён: {path}")
+        except Exception as e:
+            print(f"⚠ Ошибка при сохранении отчёта о запуске: {e}")
+        return report
+
+    def prometheus(self):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            name = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, hist in self._stages.items():
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+            for counter, values in self._counters.items():
+                name = f"{METRIC_PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                for key, value in values.items():
+                    labels = format_labels(key)
+                    lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(key):
+    return ",".join(f'{label}="{value}"' for label, value in key)
+
+
+METRICS = Metrics()
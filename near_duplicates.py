@@ -0,0 +1,95 @@
+"""Поиск почти-дубликатов по SimHash с LSH-индексом по полосам битов."""
+
+import hashlib
+from collections import OrderedDict
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 2 # слов в одном шингле
+LSH_BANDS = 8 # полос; при расстоянии <= LSH_BANDS - 1 совпадение хотя бы одной полосы гарантировано
+MAX_DISTANCE = 7 # максимальное расстояние Хэмминга для почти-дубликата
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Разбивает нормализованный текст на перекрывающиеся n-граммы слов"""
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text, size=SHINGLE_SIZE):
+    """64-битный SimHash по шинглам нормализованного текста"""
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles(text, size):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def band_keys(fingerprint, bands=LSH_BANDS):
+    """Делит отпечаток на полосы; ключ полосы — (номер, значение битов)"""
+    keys = []
+    start = 0
+    for band in range(bands):
+        width = SIMHASH_BITS // bands + (1 if band < SIMHASH_BITS % bands else 0)
+        keys.append((band, fingerprint >> start & ((1 << width) - 1)))
+        start += width
+    return keys
+
+
+class SimHashIndex:
+    """
+    LSH-индекс отпечатков SimHash. Кандидаты ищутся только в корзинах
+    совпадающих полос, поэтому стоимость поиска почти не растёт с историей.
+    Самые старые отпечатки вытесняются при превышении max_items.
+    """
+
+    def __init__(self, max_items, bands=LSH_BANDS, max_distance=MAX_DISTANCE):
+        self.max_items = max_items
+        self.bands = bands
+        self.max_distance = max_distance
+        self._fingerprints = OrderedDict()
+        self._buckets = {}
+
+    def add(self, fingerprint):
+        if fingerprint in self._fingerprints:
+            return
+        self._fingerprints[fingerprint] = None
+        for key in band_keys(fingerprint, self.bands):
+            self._buckets.setdefault(key, set()).add(fingerprint)
+        while len(self._fingerprints) > self.max_items:
+            self._remove(self._fingerprints.popitem(last=False)[0])
+
+    def _remove(self, fingerprint):
+        for key in band_keys(fingerprint, self.bands):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self._buckets[key]
+
+    def find(self, fingerprint):
+        """Возвращает ближайший сохранённый отпечаток в пределах max_distance или None"""
+        best = None
+        best_distance = self.max_distance + 1
+        for key in band_keys(fingerprint, self.bands):
+            for candidate in self._buckets.get(key, ()):
+                distance = hamming_distance(fingerprint, candidate)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best
+
+    def values(self):
+        return list(self._fingerprints)
+
+    def __len__(self):
+        return len(self._fingerprints)
@@ -3,31 +3,64 @@ import json
 import time
 import hashlib
 import requests
-import feedparser
 import re
-from bs4 import BeautifulSoup
+import calendar
+import gzip
+import threading
+from contextlib import closing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
-from readability import Document
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from keyword_matcher import KeywordMatcher
+from metrics import METRICS
+from bloom_filter import RotatingBloomFilter
+from near_duplicates import hamming_distance, simhash
+from run_budget import CHARS_PER_TOKEN, RunBudget, estimate_tokens
+from sent_index import SentIndex
+from state_journal import append_record, read_records, truncate, write_atomic
+from story_clusters import cluster_stories
+from summarizer import SummaryCache, Summarizer
+from telegram_dispatcher import TelegramDispatcher
+from text_reducer import chunk_text, reduce_text
 
 # --- Константы ---
-FEEDS = [
-    "https://www.deutschlandfunk.de/nachrichten-100.rss",
-    "https://www.deutschlandfunk.de/politikportal-100.rss",
-    "https://www.deutschlandfunk.de/wirtschaft-106.rss",
-    "https://www.spiegel.de/thema/deutschland/index.rss",
-    "https://www.tagesschau.de/inland/migration-101~rss.xml",
-    "https://www.spiegel.de/thema/integration/index.rss",
-    "https://www.zeit.de/serie/die-aufdecker/index.xml",
-    "https://www.tagesspiegel.de/feed/politik-deutschland.xml",
-    "https://www.aljazeera.com/xml/rss/all.xml",
-    "https://www.faz.net/rss/aktuell/politik/inland"
-]
+# Ленты, их приоритет, лимиты и собственные ключевые слова задаются в feeds.json
+FEED_CONFIG_FILE = os.getenv("FEED_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feeds.json"))
+FEED_DEFAULTS = {
+    "priority": 1, # чем больше, тем выше сюжеты ленты в очереди прохода
+    "max_per_run": 10, # сюжетов из ленты за один проход, остальные откладываются
+    "prefilter": False, # заголовок/анонс должен содержать ключевое слово ещё до загрузки статьи
+    "keywords": [],
+    "blocked_keywords": [],
+}
+
+with open(FEED_CONFIG_FILE, "r", encoding="utf-8") as f:
+    FEED_CONFIG = {feed["url"]: {**FEED_DEFAULTS, **feed} for feed in json.load(f)["feeds"]}
+FEEDS = list(FEED_CONFIG)
 
-MAX_ARTICLES = 1000
+MAX_ARTICLES = 300 # точная история последних статей; вытесненные URL и хеши содержимого уходят в фильтр Блума
 MAX_TOKENS = 400
-MAX_CHARS = 8000
 MAX_AGE_SECONDS = 21600 # 6 часов
 
+FEED_WORKERS = 10 # параллельные загрузки лент
+FEED_TIMEOUT = 15 # секунд на одну ленту (connect + read)
+ARTICLE_TIMEOUT = 10 # секунд на загрузку одной статьи
+ARTICLE_IO_WORKERS = 8 # параллельные загрузки статей
+ARTICLE_HOST_LIMIT = 2 # одновременных запросов к одному хосту
+ARTICLE_CPU_WORKERS = max(1, min(4, os.cpu_count() or 1)) # процессы для разбора HTML (lxml/readability)
+# Сколько текста статьи вообще может попасть в LLM: SUMMARY_MAX_CHUNKS фрагментов по SUMMARY_CHUNK_TOKENS
+SUMMARY_INPUT_TOKENS = 1200 # бюджет текста для одного запроса; длиннее — лид и самые насыщенные абзацы
+SUMMARY_CHUNK_TOKENS = 1500 # размер фрагмента при map-reduce
+SUMMARY_MAX_CHUNKS = 4
+MAP_REDUCE_MIN_TOKENS = 3 * SUMMARY_INPUT_TOKENS # начиная с этой длины текст суммаризируется по фрагментам
+CHUNK_SUMMARY_TOKENS = 200 # max_tokens резюме одного фрагмента
+MAX_TEXT_CHARS = SUMMARY_MAX_CHUNKS * SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN
+# Разметка занимает в десятки раз больше текста; при обрезке сохраняется начало статьи с лидом
+MAX_HTML_BYTES = MAX_TEXT_CHARS * 32
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+USER_AGENT = "Mozilla/5.0 (compatible; SmartBot/1.0; +https://github.com/Newsbot223/smartbot-cron)"
+
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 CHAT_ID = os.getenv("CHAT_ID")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
@@ -37,32 +70,105 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+SUMMARY_MODEL = "mistralai/mistral-7b-instruct"
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "3")) # одновременных запросов к LLM
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "20"))
+LLM_MAX_RETRIES = 3 # повторов при 429/5xx и сетевых ошибках
+LLM_MAX_RETRY_DELAY = 60 # секунд; если LLM просит ждать дольше, статья повторяется в следующем запуске
+LLM_TIMEOUT = 60
+SUMMARY_CACHE_TTL = 2 * 86400 # 2 дня
+
+TELEGRAM_API = "https://api.telegram.org"
+TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1.0")) # секунд между сообщениями в чат
+TELEGRAM_MAX_RETRIES = 3
+TELEGRAM_MAX_RETRY_AFTER = 60 # секунд; если Telegram просит ждать дольше, отправка откладывается до следующего запуска
+DIGEST_MODE = os.getenv("DIGEST_MODE", "0") == "1" # короткие резюме объединяются в одно сообщение
+
+# Бюджет одного прохода (0 — без ограничения): что не поместилось, откладывается на следующий
+RUN_MAX_LLM_TOKENS = int(os.getenv("RUN_MAX_LLM_TOKENS", "60000"))
+RUN_MAX_SECONDS = int(os.getenv("RUN_MAX_SECONDS", "900"))
+RUN_MAX_MESSAGES = int(os.getenv("RUN_MAX_MESSAGES", "15"))
+
+# Веса ранжирования сюжетов
+SCORE_KEYWORD_WEIGHT = 1.0 # за единицу оценки ключевых слов в заголовке и анонсе
+SCORE_RECENCY_WEIGHT = 3.0 # только что опубликованная запись получает 3 балла, к MAX_AGE_SECONDS — 0
+SCORE_PRIORITY_WEIGHT = 1.0 # за единицу priority ленты
+SCORE_SOURCE_WEIGHT = 1.0 # за каждый дополнительный источник сюжета
+
+# Термины ищутся как целые слова; "*" в конце — префикс, в начале — окончание составного слова
 KEYWORDS = [
-    "regierung", "bundestag", "wirtschaft", "ampel", "haushalt", "migration",
-    "bürgergeld", "afd", "spd", "cdu", "grüne", "wahl", "streik",
-    "arbeitsmarkt", "deutschland", "eu", "gesetz", "energie", "asyl", "krieg",
-    "grenze", "grenzen", "grenzschutz", "bundespolizei", "flüchtlinge", "einreise", "Germany",
+    "*regierung", "bundestag*", "wirtschaft*", "ampel", "haushalt*", "migration*",
+    "bürgergeld", "afd", "spd", "cdu", "grüne", "*wahl", "*wahlen", "streik*",
+    "arbeitsmarkt", "deutschland", "eu", "gesetz*", "energie*", "asyl*", "krieg",
+    "grenze", "grenzen", "grenzschutz", "bundespolizei", "flüchtling*", "einreise", "Germany",
     "German", "Berlin", "Munich", "Hamburg", "refugees", "asylum", "migrants", "integration"
 ]
 
 BLOCKED_KEYWORDS = [
     "wetter", "wetterbericht", "regen", "sonnig", "heiter", "unwetter",
     "vorhersage", "temperature", "schnee", "hitze",
-    "sport", "bundesliga", "fußball", "tor", "spiel", "trainer",
+    "sport", "bundesliga", "fußball*", "tor", "spiel", "trainer",
     "verein", "tabelle", "champions league", "olympia", "weltmeisterschaft",
     "spieltag", "tennis", "formel 1", "handball", "basketball"
 ]
 
+# Дополнительные ключевые и блокирующие слова для отдельных лент
+FEED_KEYWORDS = {url: feed["keywords"] for url, feed in FEED_CONFIG.items() if feed["keywords"]}
+FEED_BLOCKED_KEYWORDS = {url: feed["blocked_keywords"] for url, feed in FEED_CONFIG.items() if feed["blocked_keywords"]}
+
+# Широкие ленты, где заголовок/анонс должен содержать ключевое слово ещё до загрузки статьи
+PREFILTER_KEYWORD_FEEDS = {url for url, feed in FEED_CONFIG.items() if feed["prefilter"]}
+
+SKIP_MESSAGES = {
+    "sent": "⏩ Bereits verarbeitet",
+    "too_old": "⏳ Zu alt, übersprungen",
+    "blocked": "❌ Thema blockiert",
+    "irrelevant": "⛔ Thema nicht relevant",
+    "rejected": "🚫 Bereits abgelehnt",
+}
+
 STATE_DIR = "bot-state"
 STATE_FILE = os.path.join(STATE_DIR, "last_file_id.json")
 LOCAL_CACHE_FILE = os.path.join(STATE_DIR, "local_cache.json")
+SNAPSHOT_FORMAT = "smartbot-sent-articles"
+SNAPSHOT_VERSION = 2 # gzip + компактный JSON с заголовком; версия 1 — обычный JSON без заголовка
+LOCAL_CACHE_JOURNAL = os.path.join(STATE_DIR, "local_cache.journal")
+JOURNAL_MAX_BYTES = 256 * 1024 # после этого журнал сворачивается в снимок
 CACHE_META_FILE = os.path.join(STATE_DIR, "cache_meta.json")
+REJECTION_CACHE_FILE = os.path.join(STATE_DIR, "rejected_cache.json")
+FEED_CACHE_FILE = os.path.join(STATE_DIR, "feed_cache.json") # ETag/Last-Modified лент
+RUN_REPORT_FILE = os.path.join(STATE_DIR, "run_report.json")
+SUMMARY_CACHE_FILE = os.path.join(STATE_DIR, "summary_cache.json")
+SEEN_FILTER_FILE = os.path.join(STATE_DIR, "seen_filter.bin") # долгая память URL и хешей содержимого
+SEEN_FILTER_CAPACITY = int(os.getenv("SEEN_FILTER_CAPACITY", "20000")) # значений в одном поколении (~36 КБ при 0.1%)
+SEEN_FILTER_ERROR_RATE = float(os.getenv("SEEN_FILTER_ERROR_RATE", "0.001")) # доля новых статей, ошибочно принятых за отправленные
+SEEN_FILTER_GENERATIONS = 2 # поколений фильтра: горизонт памяти не меньше SEEN_FILTER_CAPACITY значений
+DEFERRED_FILE = os.path.join(STATE_DIR, "deferred.json") # кандидаты, не поместившиеся в бюджет прохода
+DEFERRED_FIELDS = ("feed_url", "url", "title", "preview", "published")
+
+# Сколько секунд помнить отклонённую статью: отказы по содержимому живут, пока
+# статья не устареет, временные сбои (таймауты, 5xx, ошибки LLM) — до следующих запусков
+REJECTION_TTL = {
+    "too_short": MAX_AGE_SECONDS,
+    "irrelevant": MAX_AGE_SECONDS,
+    "blocked": MAX_AGE_SECONDS,
+    "duplicate": MAX_AGE_SECONDS,
+    "http_error": MAX_AGE_SECONDS,
+    "parse_error": MAX_AGE_SECONDS,
+    "fetch_error": 3600,
+    "summarize_failed": 3600,
+}
+# Временные отказы: пока такой отказ действует, валидаторы ленты не сохраняются,
+# чтобы после его истечения лента была загружена целиком и статья повторена
+TRANSIENT_REJECTIONS = {"fetch_error", "summarize_failed"}
+TRANSIENT_HTTP_STATUSES = {408, 429} # ответы 4xx, после которых статью стоит запросить снова
 
 os.makedirs(STATE_DIR, exist_ok=True)
 
 def generate_filename():
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    return f"sent_articles_{timestamp}.json"
+    return f"sent_articles_{timestamp}.json.gz"
 
 def get_cache_meta():
     """Получает метаданные о локальном кэше"""
@@ -74,16 +180,17 @@ def get_cache_meta():
             print(f"⚠ Ошибка при чтении метаданных кэша: {e}")
     return {"last_update": 0, "hash": ""}
 
-def update_cache_meta(data):
-    """Обновляет метаданные о локальном кэше"""
+def update_cache_meta(data, digest):
+    """Обновляет метаданные о локальном кэше (digest — md5 записанного снимка)"""
     meta = {
         "last_update": int(time.time()),
-        "hash": hashlib.md5(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest(),
+        "hash": digest,
         "count": {
             "urls": len(data.get("urls", [])),
             "hashes": len(data.get("hashes", [])),
             "titles": len(data.get("titles", [])),
-            "content_hashes": len(data.get("content_hashes", []))
+            "content_hashes": len(data.get("content_hashes", [])),
+            "simhashes": len(data.get("simhashes", []))
         }
     }
     try:
@@ -95,6 +202,105 @@ def update_cache_meta(data):
         print(f"⚠ Ошибка при обновлении метаданных кэша: {e}")
         return None
 
+def load_rejection_cache():
+    """Загружает кэш отклонённых статей без просроченных записей"""
+    cache = {}
+    if os.path.exists(REJECTION_CACHE_FILE):
+        try:
+            with open(REJECTION_CACHE_FILE, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except Exception as e:
+            print(f"⚠ Ошибка при чтении кэша отклонённых статей: {e}")
+    prune_rejections(cache)
+    print(f"📂 Отклонённых статей в кэше: {len(cache)}")
+    return cache
+
+def save_rejection_cache(cache):
+    """
+    Сохраняет кэш отклонённых статей. Просроченные записи удаляются из самого
+    cache, чтобы словарь демона не рос всё время работы процесса.
+    """
+    prune_rejections(cache)
+    try:
+        with open(REJECTION_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"💾 Кэш отклонённых статей обновлен: {len(cache)}")
+        return True
+    except Exception as e:
+        print(f"⚠ Ошибка при сохранении кэша отклонённых статей: {e}")
+        return False
+
+def prune_rejections(cache):
+    """Удаляет из кэша отклонённых статей просроченные записи (на месте)"""
+    now = time.time()
+    for url in [url for url, item in cache.items() if item.get("expires", 0) <= now]:
+        del cache[url]
+    return cache
+
+def remember_rejection(cache, url, reason):
+    """Запоминает причину отказа для URL на время REJECTION_TTL[reason]"""
+    ttl = REJECTION_TTL.get(reason)
+    if ttl:
+        cache[url] = {"reason": reason, "expires": int(time.time() + ttl)}
+
+def get_rejection(cache, url):
+    """Возвращает причину действующего отказа для URL или None"""
+    item = cache.get(url)
+    if item and item.get("expires", 0) > time.time():
+        return item.get("reason")
+    return None
+
+def is_deferred_expired(item, now):
+    published = item.get("published") or item.get("deferred_at", 0)
+    return published + MAX_AGE_SECONDS < now
+
+def load_deferred():
+    """Загружает отложенных кандидатов, кроме устаревших"""
+    deferred = []
+    if os.path.exists(DEFERRED_FILE):
+        try:
+            with open(DEFERRED_FILE, "r", encoding="utf-8") as f:
+                deferred = json.load(f)
+        except Exception as e:
+            print(f"⚠ Ошибка при чтении отложенных статей: {e}")
+    now = time.time()
+    deferred = [item for item in deferred if not is_deferred_expired(item, now)]
+    if deferred:
+        print(f"📂 Отложенных статей: {len(deferred)}")
+    return deferred
+
+def save_deferred(deferred):
+    """Сохраняет отложенных кандидатов, удаляя устаревших"""
+    now = time.time()
+    deferred = [item for item in deferred if not is_deferred_expired(item, now)]
+    try:
+        with open(DEFERRED_FILE, "w", encoding="utf-8") as f:
+            json.dump(deferred, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"💾 Отложенные статьи сохранены: {len(deferred)}")
+        return True
+    except Exception as e:
+        print(f"⚠ Ошибка при сохранении отложенных статей: {e}")
+        return False
+
+def load_feed_cache():
+    """Загружает сохранённые ETag/Last-Modified и хеши лент"""
+    if os.path.exists(FEED_CACHE_FILE):
+        try:
+            with open(FEED_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠ Ошибка при чтении кэша лент: {e}")
+    return {}
+
+def save_feed_cache(cache):
+    try:
+        with open(FEED_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"⚠ Ошибка при сохранении кэша лент: {e}")
+        return False
+
 def get_telegram_file_info():
     """Получает информацию о последнем файле из Telegram"""
     if not os.path.exists(STATE_FILE):
@@ -121,14 +327,15 @@ def download_by_file_id(file_id, filename):
         
     try:
         print(f"🔄 Попытка загрузки файла из Telegram с file_id: {file_id}")
-        info = requests.get(f"https://api.telegram.org/bot{BOT_TOKEN}/getFile?file_id={file_id}").json()
+        session = get_http_session()
+        info = session.get(f"{TELEGRAM_API}/bot{BOT_TOKEN}/getFile", params={"file_id": file_id}, timeout=30).json()
         if not info.get("ok", False):
             print(f"⚠ Telegram API вернул ошибку: {info}")
             return None
             
         file_path = info["result"]["file_path"]
-        url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
-        data = requests.get(url).content
+        url = f"{TELEGRAM_API}/file/bot{BOT_TOKEN}/{file_path}"
+        data = session.get(url, timeout=60).content
         with open(filename, "wb") as f:
             f.write(data)
         print(f"📥 Успешно загружен {filename} из Telegram по file_id")
@@ -137,6 +344,34 @@ def download_by_file_id(file_id, filename):
         print("⚠ Ошибка при скачивании по file_id:", e)
         return None
 
+def encode_snapshot(data):
+    """Упаковывает историю для Telegram: компактный JSON с заголовком версии, сжатый gzip"""
+    envelope = {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "data": data}
+    payload = json.dumps(envelope, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(payload, mtime=0)
+
+def decode_snapshot(raw):
+    """Распаковывает снимок истории: gzip с заголовком версии или старый обычный JSON"""
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    loaded = json.loads(raw.decode("utf-8"))
+    if isinstance(loaded, dict) and loaded.get("format") == SNAPSHOT_FORMAT:
+        if loaded.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"неизвестная версия снимка: {loaded.get('version')}")
+        return loaded.get("data", {})
+    return loaded
+
+def get_local_cache_digest():
+    """md5 файла локального кэша (совпадает с hash в cache_meta.json) или None"""
+    try:
+        with open(LOCAL_CACHE_FILE, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def is_journal_empty():
+    return not os.path.exists(LOCAL_CACHE_JOURNAL) or os.path.getsize(LOCAL_CACHE_JOURNAL) == 0
+
 def load_local_cache():
     """Загружает данные из локального кэша"""
     data = {"urls": [], "content_hashes": [], "titles": [], "hashes": []}
@@ -159,35 +394,39 @@ def load_sent_articles():
     """
     Загружает историю отправленных статей.
     Пытается загрузить из Telegram, если доступно, иначе использует локальный кэш.
+    Возвращает SentIndex и имя файла для следующей отправки.
     """
-    data = {"urls": [], "content_hashes": [], "titles": [], "hashes": []}
     filename = generate_filename()
     
     print("\n" + "="*50)
     print("🔄 Запуск процесса загрузки истории статей...")
     print("="*50)
     
-    # Пытаемся загрузить из Telegram, если есть валидный file_id
+    # Если локальный кэш совпадает с последним снимком в Telegram, скачивать его не нужно
     telegram_info = get_telegram_file_info()
+    if telegram_info and telegram_info.get("hash") and is_journal_empty() \
+            and telegram_info["hash"] == get_local_cache_digest():
+        print("✅ Локальный кэш совпадает со снимком в Telegram, загрузка пропущена")
+        sent = SentIndex.from_dict(load_local_cache(), MAX_ARTICLES, load_seen_filter())
+        return sent, filename
+
+    # Пытаемся загрузить из Telegram, если есть валидный file_id
     if telegram_info and telegram_info.get("file_id"):
         print(f"📡 Найдена информация о файле в Telegram: {telegram_info}")
         path = download_by_file_id(telegram_info["file_id"], telegram_info.get("filename", filename))
         if path and os.path.exists(path):
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    loaded_data = json.load(f)
-                
-                # Обновляем структуру данных
-                data["urls"] = loaded_data.get("urls", [])
-                data["titles"] = loaded_data.get("titles", [])
-                data["hashes"] = loaded_data.get("hashes", [])
-                data["content_hashes"] = loaded_data.get("content_hashes", [])
+                with open(path, "rb") as f:
+                    loaded_data = decode_snapshot(f.read())
                 
-                print(f"✅ Успешно загружены данные из Telegram: URLs: {len(data['urls'])}, Titles: {len(data['titles'])}")
+                sent = SentIndex.from_dict(loaded_data, MAX_ARTICLES, load_seen_filter())
+                counts = sent.counts()
+                print(f"✅ Успешно загружены данные из Telegram: URLs: {counts['urls']}, Titles: {counts['titles']}")
                 
                 # Сохраняем в локальный кэш для резервного копирования
-                save_local_cache(data)
-                return data, filename
+                replay_local_journal(sent)
+                save_local_cache(sent)
+                return sent, filename
             except Exception as e:
                 print(f"⚠ Ошибка при обработке загруженного файла: {e}")
     else:
@@ -195,61 +434,130 @@ def load_sent_articles():
     
     # Если не удалось загрузить из Telegram, используем локальный кэш
     print("📂 Используем локальный кэш...")
-    data = load_local_cache()
-    
-    # Убедимся, что у нас есть все необходимые ключи
-    if "content_hashes" not in data:
-        data["content_hashes"] = []
-    if "urls" not in data:
-        data["urls"] = []
-    if "titles" not in data:
-        data["titles"] = []
-    if "hashes" not in data:
-        data["hashes"] = []
-    
-    return data, filename
+    sent = SentIndex.from_dict(load_local_cache(), MAX_ARTICLES, load_seen_filter())
+    if replay_local_journal(sent) or os.path.exists(LOCAL_CACHE_JOURNAL) and os.path.getsize(LOCAL_CACHE_JOURNAL):
+        # Сворачиваем журнал в снимок, заодно убирая недописанные строки
+        save_local_cache(sent)
+    return sent, filename
+
+def load_seen_filter():
+    """Загружает фильтр Блума с вытесненными из истории URL и хешами содержимого"""
+    if os.path.exists(SEEN_FILTER_FILE):
+        try:
+            with open(SEEN_FILTER_FILE, "rb") as f:
+                seen = RotatingBloomFilter.from_bytes(f.read(), SEEN_FILTER_CAPACITY, SEEN_FILTER_ERROR_RATE, SEEN_FILTER_GENERATIONS)
+            print(f"📂 Долгая память: {len(seen)} значений, {seen.size_bytes() // 1024} КБ")
+            return seen
+        except Exception as e:
+            print(f"⚠ Ошибка при чтении фильтра долгой памяти: {e}")
+    return RotatingBloomFilter(SEEN_FILTER_CAPACITY, SEEN_FILTER_ERROR_RATE, SEEN_FILTER_GENERATIONS)
+
+def save_seen_filter(seen):
+    """
+    Атомарно сохраняет фильтр долгой памяти, если в него что-то добавилось.
+    Пустой фильтр тоже записывается один раз: файл состояния существует с первого снимка.
+    """
+    if seen is None or not seen.dirty and os.path.exists(SEEN_FILTER_FILE):
+        return True
+    try:
+        write_atomic(SEEN_FILTER_FILE, seen.to_bytes())
+        seen.dirty = False
+        print(f"💾 Долгая память обновлена: {len(seen)} значений")
+        return True
+    except Exception as e:
+        print(f"⚠ Ошибка при сохранении фильтра долгой памяти: {e}")
+        return False
+
+def make_journal_record(article):
+    """Запись журнала об одной отправленной статье"""
+    record = {key: article.get(key) for key in ("url", "title", "hash", "content_hash")}
+    if article.get("simhash") is not None:
+        record["simhash"] = f"{article['simhash']:016x}"
+    return record
+
+def replay_local_journal(sent):
+    """Применяет к SentIndex записи журнала, ещё не вошедшие в снимок"""
+    try:
+        records = read_records(LOCAL_CACHE_JOURNAL)
+    except Exception as e:
+        print(f"⚠ Ошибка при чтении журнала кэша: {e}")
+        return 0
+    for record in records:
+        simhash_hex = record.get("simhash")
+        sent.add(
+            url=record.get("url"),
+            title=record.get("title"),
+            hash_=record.get("hash"),
+            content_hash=record.get("content_hash"),
+            simhash=int(simhash_hex, 16) if simhash_hex else None,
+        )
+    if records:
+        print(f"📜 Из журнала восстановлено записей: {len(records)}")
+    return len(records)
+
+def save_local_cache(sent, article=None):
+    """
+    Сохраняет SentIndex в локальный кэш.
+    С article дописывает одну запись в журнал — стоимость не зависит от размера истории.
+    Без него (или когда журнал вырос) атомарно переписывает снимок и очищает журнал.
+    """
+    if article is not None:
+        try:
+            size = append_record(LOCAL_CACHE_JOURNAL, make_journal_record(article))
+            if size < JOURNAL_MAX_BYTES:
+                print(f"📝 Запись добавлена в журнал кэша: {article.get('url')}")
+                return True
+        except Exception as e:
+            print(f"⚠ Ошибка при записи в журнал кэша: {e}")
 
-def save_local_cache(data):
-    """Сохраняет данные в локальный кэш-файл"""
+    data = sent.to_dict()
     try:
-        with open(LOCAL_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # Фильтр пишется раньше снимка: вытесненные из снимка записи не теряются при сбое
+        save_seen_filter(sent.archive)
+        write_atomic(LOCAL_CACHE_FILE, payload)
+        truncate(LOCAL_CACHE_JOURNAL)
         print(f"💾 Локальный кэш обновлен: {LOCAL_CACHE_FILE}")
         
         # Обновляем метаданные кэша
-        update_cache_meta(data)
+        update_cache_meta(data, hashlib.md5(payload).hexdigest())
         return True
     except Exception as e:
         print(f"⚠ Ошибка при сохранении локального кэша: {e}")
         return False
 
-def save_sent_articles(data, local_file):
+def save_sent_articles(sent, local_file):
     """Сохраняет историю отправленных статей и отправляет файл в Telegram"""
-    # Ограничиваем размер списков
-    data["urls"] = data["urls"][-MAX_ARTICLES:]
-    data["hashes"] = data["hashes"][-MAX_ARTICLES:]
-    data["titles"] = data.get("titles", [])[-MAX_ARTICLES:]
-    data["content_hashes"] = data.get("content_hashes", [])[-MAX_ARTICLES:]
+    # Ограничиваем размер истории
+    sent.evict()
+    data = sent.to_dict()
 
     # Сохраняем в локальный кэш
-    save_local_cache(data)
+    save_local_cache(sent)
+
+    # Если история не изменилась с последней отправки, повторно не загружаем
+    digest = get_local_cache_digest()
+    telegram_info = get_telegram_file_info()
+    if digest and telegram_info and telegram_info.get("hash") == digest:
+        print("⏩ История не изменилась, отправка снимка в Telegram пропущена")
+        return True
 
     # Сохраняем в файл для отправки
     try:
-        with open(local_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"📎 Сохранен файл для отправки: {local_file}")
+        with open(local_file, "wb") as f:
+            f.write(encode_snapshot(data))
+        print(f"📎 Сохранен файл для отправки: {local_file} ({os.path.getsize(local_file)} байт)")
     except Exception as e:
         print(f"⚠ Ошибка при сохранении файла для отправки: {e}")
         return False
 
     # Отправляем файл в Telegram
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendDocument"
+        url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendDocument"
         with open(local_file, "rb") as f:
             files = {"document": f}
             data_tg = {"chat_id": CHAT_ID, "caption": "✅ Новый sent_articles файл"}
-            res = requests.post(url, files=files, data=data_tg)
+            res = get_http_session().post(url, files=files, data=data_tg, timeout=60)
 
             try:
                 response_json = res.json()
@@ -263,7 +571,13 @@ def save_sent_articles(data, local_file):
 
             if res.status_code == 200 and file_id:
                 with open(STATE_FILE, "w") as meta:
-                    json.dump({"file_id": file_id, "filename": local_file, "timestamp": int(time.time())}, meta)
+                    json.dump({
+                        "file_id": file_id,
+                        "filename": local_file,
+                        "timestamp": int(time.time()),
+                        "hash": digest,
+                        "version": SNAPSHOT_VERSION,
+                    }, meta)
                 print(f"📤 Отправлен {local_file}, сохранён file_id")
 
                 os.utime(STATE_FILE, None)
@@ -275,17 +589,242 @@ def save_sent_articles(data, local_file):
         print(f"⚠ Ошибка при отправке файла в Telegram: {e}")
         return False
 
-def get_article_text(url):
+_http_session = None
+_host_semaphores = {}
+_host_lock = threading.Lock()
+
+def get_http_session():
+    """Возвращает общую HTTP-сессию с пулом keep-alive соединений"""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        pool_size = max(FEED_WORKERS, ARTICLE_IO_WORKERS, LLM_CONCURRENCY)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_session = session
+    return _http_session
+
+def fetch_feed(feed_url, validators=None):
+    """
+    Загружает одну RSS-ленту условным запросом (If-None-Match / If-Modified-Since).
+    Возвращает (feed, validators): feed = None, если лента не изменилась или произошла ошибка.
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
     try:
-        response = requests.get(url, timeout=10)
-        html = response.text
-        doc = Document(html)
-        summary = doc.summary()
-        text = BeautifulSoup(summary, "html.parser").get_text(separator="\n", strip=True)
-        return text
+        with METRICS.stage("feed_fetch"):
+            response = get_http_session().get(feed_url, headers=headers, timeout=FEED_TIMEOUT)
+        if response.status_code == 304:
+            METRICS.inc("feeds", status="not_modified")
+            return None, validators
+        response.raise_for_status()
+        METRICS.inc("bytes_downloaded", len(response.content), kind="feed")
+        digest = hashlib.md5(response.content).hexdigest()
+        fresh = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest,
+        }
+        # Сервер без поддержки условных запросов вернул тот же документ
+        if digest == validators.get("digest"):
+            METRICS.inc("feeds", status="unchanged")
+            return None, fresh
+        import feedparser
+        METRICS.inc("feeds", status="changed")
+        with METRICS.stage("feed_parse"):
+            return feedparser.parse(response.content), fresh
     except Exception as e:
-        print("⚠ Ошибка при загрузке статьи:", e)
-        return ""
+        print(f"⚠ Ошибка при загрузке ленты {feed_url}: {e}")
+        METRICS.inc("feeds", status="error")
+        return None, validators
+
+def fetch_feeds(feed_urls, feed_cache=None):
+    """
+    Параллельно загружает ленты через ограниченный пул потоков условными запросами.
+    Возвращает тройки (feed_url, feed, validators) в исходном порядке — только для
+    изменившихся лент. Новые validators записываются в feed_cache вызывающим кодом
+    после обработки ленты.
+    """
+    if not feed_urls:
+        return []
+    feed_cache = feed_cache if feed_cache is not None else {}
+    started = time.time()
+    workers = min(FEED_WORKERS, len(feed_urls))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda url: fetch_feed(url, feed_cache.get(url)), feed_urls))
+    fetched = [(url, feed, validators) for url, (feed, validators) in zip(feed_urls, results) if feed is not None]
+    print(f"📡 Изменилось лент: {len(fetched)}/{len(feed_urls)} за {time.time() - started:.1f} с")
+    return fetched
+
+_keyword_matchers = {}
+
+def get_source_name(url):
+    """Короткое имя источника для ссылки: домен без www"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def get_keyword_matcher(feed_url=None):
+    """Возвращает скомпилированный KeywordMatcher для ленты (с учётом её собственных слов)"""
+    if feed_url not in _keyword_matchers:
+        _keyword_matchers[feed_url] = KeywordMatcher(
+            KEYWORDS + FEED_KEYWORDS.get(feed_url, []),
+            BLOCKED_KEYWORDS + FEED_BLOCKED_KEYWORDS.get(feed_url, []),
+        )
+    return _keyword_matchers[feed_url]
+
+def get_entry_age(entry):
+    """Возраст записи ленты в секундах или None, если дата не указана"""
+    published = entry.get("published_parsed") or entry.get("updated_parsed")
+    if not published:
+        return None
+    return time.time() - calendar.timegm(published)
+
+def get_entry_preview(entry):
+    """Заголовок и анонс записи ленты без HTML-разметки"""
+    summary = re.sub(r"<[^>]+>", " ", entry.get("summary", "") or "")
+    return f"{entry.get('title', '')}\n{summary}"
+
+def prefilter_entry(feed_url, entry, sent):
+    """
+    Дешёвые проверки по метаданным ленты до загрузки статьи.
+    Возвращает причину отказа (ключ SKIP_MESSAGES) или None.
+    """
+    if sent.has_url(entry.link) or sent.has_title(entry.title):
+        return "sent"
+
+    age = get_entry_age(entry)
+    if age is not None and age > MAX_AGE_SECONDS:
+        return "too_old"
+
+    keywords = get_keyword_matcher(feed_url).match(get_entry_preview(entry))
+    if keywords.blocked:
+        return "blocked"
+    if feed_url in PREFILTER_KEYWORD_FEEDS and not keywords.relevant:
+        return "irrelevant"
+    return None
+
+def score_candidate(candidate):
+    """Оценка кандидата для очереди прохода: ключевые слова анонса, свежесть и приоритет ленты"""
+    feed_url = candidate["feed_url"]
+    keywords = get_keyword_matcher(feed_url).match(candidate["preview"])
+    published = candidate.get("published")
+    if published is None:
+        recency = 0.5
+    else:
+        recency = 1 - min(max(time.time() - published, 0), MAX_AGE_SECONDS) / MAX_AGE_SECONDS
+    priority = FEED_CONFIG.get(feed_url, FEED_DEFAULTS)["priority"]
+    return round(
+        SCORE_KEYWORD_WEIGHT * keywords.score
+        + SCORE_RECENCY_WEIGHT * recency
+        + SCORE_PRIORITY_WEIGHT * priority,
+        3,
+    )
+
+def get_host_semaphore(url):
+    """Возвращает семафор, ограничивающий число одновременных запросов к хосту"""
+    host = urlparse(url).netloc.lower()
+    with _host_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(ARTICLE_HOST_LIMIT)
+        return _host_semaphores[host]
+
+def download_article(url):
+    """
+    Загружает HTML статьи потоком через общую сессию с учётом лимита на хост.
+    Загрузка прекращается, как только тело превышает MAX_HTML_BYTES.
+    Возвращает (байты, кодировка из Content-Type или None).
+    """
+    with get_host_semaphore(url), METRICS.stage("article_download"):
+        with get_http_session().get(url, timeout=ARTICLE_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            # requests подставляет Latin-1 для text/* без charset, поэтому берём только явную кодировку
+            encoding = response.encoding if "charset=" in response.headers.get("Content-Type", "").lower() else None
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_HTML_BYTES:
+                    print(f"✂ HTML обрезан на {size} байт: {url}")
+                    break
+    METRICS.inc("bytes_downloaded", size, kind="article")
+    # Без кодировки в заголовке она определяется при разборе по meta-тегам
+    return b"".join(chunks), encoding
+
+def parse_article_html(url, html, encoding=None):
+    """
+    Извлекает текст статьи из HTML (выполняется в пуле процессов): селекторы
+    известного сайта или readability. Возвращает Extraction(text, extractor).
+    """
+    # lxml и readability импортируются только когда есть что разбирать
+    from article_extractors import extract_article
+    return extract_article(url, html, encoding)
+
+def parse_article_html_timed(url, html, encoding=None):
+    """parse_article_html с замером времени: метрики пула процессов собираются в основном процессе"""
+    started = time.perf_counter()
+    extraction = parse_article_html(url, html, encoding)
+    return extraction, time.perf_counter() - started
+
+def classify_fetch_error(error):
+    """
+    Ошибки 4xx считаются постоянными; таймауты, обрывы, 5xx, а также 408 и 429
+    (сайт ограничивает частоту запросов) — временными.
+    """
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.HTTPError) and response is not None and 400 <= response.status_code < 500 \
+            and response.status_code not in TRANSIENT_HTTP_STATUSES:
+        return "http_error"
+    return "fetch_error"
+
+def create_parse_pool():
+    """Создаёт пул процессов для разбора HTML, при недоступности — пул потоков"""
+    try:
+        return ProcessPoolExecutor(max_workers=ARTICLE_CPU_WORKERS)
+    except (OSError, NotImplementedError) as e:
+        print(f"⚠ Пул процессов недоступен, разбор в потоках: {e}")
+        return ThreadPoolExecutor(max_workers=ARTICLE_CPU_WORKERS)
+
+def fetch_articles(candidates):
+    """
+    Конвейер извлечения статей: загрузка в пуле потоков, разбор в пуле процессов.
+    Отдаёт пары (candidate, text) по мере готовности, в порядке завершения.
+    При ошибке text пустой, а причина записывается в candidate["error"].
+    """
+    if not candidates:
+        return
+    io_pool = ThreadPoolExecutor(max_workers=min(ARTICLE_IO_WORKERS, len(candidates)))
+    parse_pool = create_parse_pool()
+    try:
+        pending = {io_pool.submit(download_article, c["url"]): ("download", c) for c in candidates}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, candidate = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠ Ошибка при загрузке статьи {candidate['url']}: {e}")
+                    candidate["error"] = classify_fetch_error(e) if stage == "download" else "parse_error"
+                    yield candidate, ""
+                    continue
+                if stage == "download":
+                    pending[parse_pool.submit(parse_article_html_timed, candidate["url"], *result)] = ("parse", candidate)
+                else:
+                    extraction, seconds = result
+                    METRICS.observe("article_parse", seconds)
+                    METRICS.inc("articles_extracted", extractor=extraction.extractor)
+                    print(f"🧩 Extrahiert ({extraction.extractor}): {candidate['title']}")
+                    yield candidate, extraction.text
+    finally:
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        parse_pool.shutdown(wait=False, cancel_futures=True)
 
 def normalize_text(text):
     """Нормализует текст для более надежного сравнения"""
@@ -297,19 +836,17 @@ def normalize_text(text):
     text = re.sub(r'[^\w\s]', '', text)
     return text
 
-def clean_article_text(text):
-    """Удаляет лишние фрагменты из текста статьи"""
-    text = re.sub(r'^Titel:\s*', '', text, flags=re.IGNORECASE | re.MULTILINE)
-    text = re.sub(r'Diese Nachricht wurde am .*? gesendet\.', '', text, flags=re.IGNORECASE | re.DOTALL)
-    return text.strip()
-
 def get_content_hash(text):
     """Создает хеш только от содержимого статьи"""
     # Берем больше текста для более надежного хеша
     normalized_text = normalize_text(text[:1000])
     return hashlib.md5(normalized_text.encode("utf-8")).hexdigest()
 
-def is_duplicate_content(text, sent_data):
+def get_text_simhash(text):
+    """Создает SimHash-отпечаток нормализованного текста статьи"""
+    return simhash(normalize_text(text))
+
+def is_duplicate_content(text, sent):
     """Проверяет, является ли статья дубликатом по содержанию"""
     if not text:
         return False
@@ -318,60 +855,107 @@ def is_duplicate_content(text, sent_data):
     content_hash = get_content_hash(text)
     
     # Проверяем, есть ли такой хеш в истории
-    if content_hash in sent_data.get("content_hashes", []):
+    if sent.has_content_hash(content_hash):
         print("🔄 Дубликат содержимого обнаружен по хешу содержания")
         return True
     
-    # Дополнительная проверка на схожесть текста (для случаев небольших изменений)
-    normalized_text = normalize_text(text[:500])
-    for i, old_hash in enumerate(sent_data.get("content_hashes", [])):
-        # Если у нас есть сохраненный текст, можно было бы сравнить напрямую
-        # Но так как у нас только хеши, используем дополнительную проверку по старому алгоритму
-        if i < len(sent_data.get("hashes", [])):
-            old_hash_base = sent_data.get("hashes", [])[i]
-            if old_hash_base and normalized_text and old_hash_base.startswith(normalized_text[:20]):
-                print("🔄 Дубликат содержимого обнаружен по частичному совпадению")
-                return True
+    # Поиск почти-дубликатов (тот же материал агентства с небольшими правками)
+    fingerprint = get_text_simhash(text)
+    match = sent.find_near_duplicate(fingerprint)
+    if match is not None:
+        print(f"🔄 Почти-дубликат обнаружен по SimHash (расстояние {hamming_distance(fingerprint, match)})")
+        return True
     
     return False
 
-def summarize(text):
-    prompt = f'''
+def build_summary_prompt(text):
+    return f'''
 Lies bitte den folgenden Text sorgfältig (auch wenn er auf Englisch ist) und fasse ihn dann auf DEUTSCH zusammen.
 
 Fasse den Inhalt in 4–7 Sätzen auf DEUTSCH zusammen.
 ➤ Verwende kurze Absätze.
-➤ Schreibe stilistisch ansprechend im Stil einer Nachrichtenseite (z. B. tagesschau.de).
+➤ Schreibe stilistisch ansprechend im Stil einer Nachrichtenseite (z. B. tagesschau.de).
 ➤ Kein Kommentar, keine Meinung, keine Übersetzung – nur eine sachliche, journalistische Zusammenfassung auf Deutsch.
 
 ⚠️ Wichtig: Der ganze Output soll ausschließlich auf DEUTSCH sein – auch wenn der Ursprungstext auf Englisch oder einer anderen Sprache ist.
 
 Text: {text}
 '''
-    try:
-        res = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=HEADERS, json={
-            "model": "mistralai/mistral-7b-instruct",
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7,
-            "max_tokens": MAX_TOKENS
-        }, timeout=60)
-        res.raise_for_status()
-        result = res.json()
-        if "choices" in result and isinstance(result["choices"], list):
-            return result["choices"][0]["message"]["content"].strip()
-    except Exception as e:
-        print("Fehler bei Zusammenfassung:", e)
-        return ""
 
-def send_message(text):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": False
-    }
-    return requests.post(url, json=payload).status_code == 200
+def build_chunk_prompt(text):
+    return f'''
+Der folgende Text ist ein Abschnitt eines längeren Artikels. Fasse die wichtigsten Fakten dieses Abschnitts in 3–4 sachlichen Sätzen auf DEUTSCH zusammen – ohne Einleitung, ohne Kommentar.
+
+Abschnitt: {text}
+'''
+
+def prepare_summary_input(text, feed_url=None):
+    """
+    Укладывает текст в бюджет токенов. Возвращает (text, chunks): короткий текст
+    остаётся как есть; длиннее SUMMARY_INPUT_TOKENS сокращается до лида и абзацев
+    с наибольшей плотностью ключевых слов; от MAP_REDUCE_MIN_TOKENS сокращается
+    до SUMMARY_MAX_CHUNKS фрагментов, которые суммаризируются по отдельности.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= SUMMARY_INPUT_TOKENS:
+        return text, None
+    matcher = get_keyword_matcher(feed_url)
+    score = lambda paragraph: matcher.match(paragraph).score
+    if tokens < MAP_REDUCE_MIN_TOKENS:
+        return reduce_text(text, SUMMARY_INPUT_TOKENS, score), None
+    reduced = reduce_text(text, SUMMARY_MAX_CHUNKS * SUMMARY_CHUNK_TOKENS, score)
+    return reduced, chunk_text(reduced, SUMMARY_CHUNK_TOKENS, SUMMARY_MAX_CHUNKS)
+
+def estimate_summary_tokens(text, chunks=None):
+    """Оценка токенов (запрос + ответ) на резюме, для бюджета прохода"""
+    if not chunks:
+        return estimate_tokens(build_summary_prompt(text)) + MAX_TOKENS
+    tokens = sum(estimate_tokens(build_chunk_prompt(chunk)) + CHUNK_SUMMARY_TOKENS for chunk in chunks)
+    return tokens + estimate_tokens(build_summary_prompt("")) + len(chunks) * CHUNK_SUMMARY_TOKENS + MAX_TOKENS
+
+_summarizer = None
+
+def get_summarizer():
+    """Возвращает общий клиент суммаризации с кэшем резюме"""
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = Summarizer(
+            session=get_http_session(),
+            url=OPENROUTER_URL,
+            headers=HEADERS,
+            model=SUMMARY_MODEL,
+            build_prompt=build_summary_prompt,
+            max_tokens=MAX_TOKENS,
+            concurrency=LLM_CONCURRENCY,
+            requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+            max_retries=LLM_MAX_RETRIES,
+            cache=SummaryCache(SUMMARY_CACHE_FILE, SUMMARY_CACHE_TTL).load(),
+            timeout=LLM_TIMEOUT,
+            metrics=METRICS,
+            build_chunk_prompt=build_chunk_prompt,
+            chunk_max_tokens=CHUNK_SUMMARY_TOKENS,
+            max_retry_delay=LLM_MAX_RETRY_DELAY,
+        )
+    return _summarizer
+
+_dispatcher = None
+
+def get_dispatcher():
+    """Возвращает общую очередь отправки сообщений в Telegram"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = TelegramDispatcher(
+            session=get_http_session(),
+            api_base=TELEGRAM_API,
+            token=BOT_TOKEN,
+            chat_id=CHAT_ID,
+            min_interval=TELEGRAM_MIN_INTERVAL,
+            max_retries=TELEGRAM_MAX_RETRIES,
+            digest=DIGEST_MODE,
+            metrics=METRICS,
+            max_retry_after=TELEGRAM_MAX_RETRY_AFTER,
+        )
+    return _dispatcher
 
 def main():
     # Выводим информацию о состоянии файлов перед загрузкой
@@ -399,94 +983,331 @@ def main():
     else:
         print("📂 STATE_FILE отсутствует")
     
+    # Сначала опрашиваем ленты: если ни одна не изменилась, состояние не загружаем
+    feed_cache = load_feed_cache()
+    deferred = load_deferred()
+    fetched = fetch_feeds(FEEDS, feed_cache)
+    if not fetched and not deferred:
+        save_feed_cache(feed_cache)
+        METRICS.write_report(RUN_REPORT_FILE)
+        print("💤 Keine neuen Einträge in den Feeds, Lauf beendet")
+        return
+
     # Загружаем историю отправленных статей
     sent, local_file = load_sent_articles()
     
     # Выводим информацию о загруженных данных
-    print(f"📊 Загружено URLs: {len(sent.get('urls', []))}, Titles: {len(sent.get('titles', []))}, Hashes: {len(sent.get('hashes', []))}, Content Hashes: {len(sent.get('content_hashes', []))}")
-    
-    # Убедимся, что у нас есть все необходимые ключи
-    if "content_hashes" not in sent:
-        sent["content_hashes"] = []
+    counts = sent.counts()
+    print(f"📊 Загружено URLs: {counts['urls']}, Titles: {counts['titles']}, Hashes: {counts['hashes']}, Content Hashes: {counts['content_hashes']}")
+
+    rejections = load_rejection_cache()
+    run_cycle(sent, fetched, rejections, feed_cache, deferred)
 
-    for feed_url in FEEDS:
-        feed = feedparser.parse(feed_url)
+    save_feed_cache(feed_cache)
+    save_rejection_cache(rejections)
+    save_deferred(deferred)
+    with METRICS.stage("snapshot_sync"):
+        save_sent_articles(sent, local_file)
+    METRICS.write_report(RUN_REPORT_FILE)
+    print("\n" + "="*50)
+    print("🏁 ЗАВЕРШЕНИЕ РАБОТЫ БОТА")
+    print("="*50)
+
+def run_cycle(sent, fetched, rejections, feed_cache, deferred=None):
+    """
+    Один проход конвейера по загруженным лентам (результат fetch_feeds) и отложенным
+    кандидатам: сбор и ранжирование сюжетов, загрузка статей, фильтры, суммаризация и
+    отправка в пределах бюджета прохода. sent, rejections, feed_cache и deferred
+    обновляются на месте: в deferred остаются сюжеты, не поместившиеся в бюджет или
+    лимит ленты; validators ленты сохраняются, только если ни одна её статья не упала
+    на временной ошибке — иначе лента будет загружена полностью ещё раз.
+    Возвращает словарь feed_url -> ссылки всех записей ленты (для планировщика опроса).
+    """
+    summarizer = get_summarizer()
+    dispatcher = get_dispatcher()
+    budget = RunBudget(RUN_MAX_LLM_TOKENS, RUN_MAX_SECONDS, RUN_MAX_MESSAGES)
+    pending = {}
+    in_flight = SentIndex(MAX_ARTICLES)
+    in_flight_stories = {} # (поле, значение) статьи из in_flight -> сюжет, в который она принята
+    retry_feeds = set()
+    still_deferred = []
+
+    def skip(url, reason):
+        """Учитывает пропуск статьи в метриках и запоминает причину отказа"""
+        METRICS.inc("articles_skipped", reason=reason)
+        remember_rejection(rejections, url, reason)
+
+    def defer(candidates, reason):
+        """Откладывает кандидатов на следующий проход"""
+        now = int(time.time())
+        for candidate in candidates:
+            METRICS.inc("articles_deferred", reason=reason)
+            still_deferred.append({
+                **{key: candidate.get(key) for key in DEFERRED_FIELDS},
+                "deferred_at": candidate.get("deferred_at") or now,
+            })
+
+    def handle_outcomes(outcomes):
+        """Записывает в историю все статьи сюжета, сообщение о котором дошло до Telegram"""
+        for articles, result in outcomes:
+            title = articles[0]["title"]
+            if result.ok:
+                others = len(articles) - 1
+                extra = f" (+{others} {'Quelle' if others == 1 else 'Quellen'})" if others else ""
+                print(f"✅ Gesendet: {title}{extra}")
+                for article in articles:
+                    METRICS.inc("articles_sent")
+                    sent.add(url=article["url"], title=article["title"], hash_=article["hash"], content_hash=article["content_hash"], simhash=article["simhash"])
+
+                    # Дописываем запись в журнал кэша после каждой успешной отправки
+                    save_local_cache(sent, article)
+            else:
+                print(f"⚠ Fehler beim Senden: {title} ({result.error})")
+                for article in articles:
+                    METRICS.inc("articles_skipped", reason="send_failed")
+                    retry_feeds.add(article["feed_url"])
+
+    def deliver(future, articles):
+        """Ставит готовое резюме сюжета в очередь отправки и обрабатывает результаты"""
+        summary = future.result()
+        if not summary:
+            for article in articles:
+                skip(article["url"], "summarize_failed")
+                retry_feeds.add(article["feed_url"])
+            return
+
+        title = articles[0]["title"]
+        if len(articles) == 1:
+            links = f"🔗 <a href='{articles[0]['url']}'>Weiterlesen</a>"
+        else:
+            links = "🔗 Quellen: " + " · ".join(f"<a href='{a['url']}'>{get_source_name(a['url'])}</a>" for a in articles)
+        caption = f"<b>📰 {title}</b>\n\n{summary}\n\n{links}"
+        dispatcher.submit(caption, articles)
+        handle_outcomes(dispatcher.drain())
+
+    def submit_story(story):
+        """
+        Одно обращение к LLM на сюжет: резюме строится по самому полному тексту.
+        Сюжет, не поместившийся в бюджет, остаётся неотправленным и откладывается.
+        """
+        articles = story["articles"]
+        representative = max(articles, key=lambda a: len(a["text"]))
+        text, chunks = prepare_summary_input(representative["text"], representative["feed_url"])
+        tokens = 0
+        if not summarizer.is_cached(representative["content_hash"]):
+            tokens = estimate_summary_tokens(text, chunks)
+        if not budget.reserve(tokens):
+            print(f"⏸ Zurückgestellt (Budget): {representative['title']}")
+            return
+        story["submitted"] = True
+        articles = [representative] + [a for a in articles if a is not representative]
+        if len(articles) > 1:
+            print(f"🧵 Story aus {len(articles)} Quellen: {representative['title']}")
+            METRICS.inc("llm_calls_saved", len(articles) - 1)
+        if chunks:
+            print(f"🧩 Map-Reduce aus {len(chunks)} Teilen: {representative['title']}")
+            METRICS.inc("summary_inputs", mode="map_reduce")
+        elif text is not representative["text"]:
+            print(f"✂ Gekürzt auf {estimate_tokens(text)} von {estimate_tokens(representative['text'])} Tokens: {representative['title']}")
+            METRICS.inc("summary_inputs", mode="reduced")
+        else:
+            METRICS.inc("summary_inputs", mode="full")
+        pending[summarizer.submit(text, representative["content_hash"], chunks)] = articles
+
+    def check_article(candidate, full_text, story):
+        """Фильтры по тексту статьи; возвращает статью для суммаризации или None"""
+        feed_url = candidate["feed_url"]
+        url = candidate["url"]
+        title = candidate["title"]
+        if candidate.get("error"):
+            skip(url, candidate["error"])
+            if candidate["error"] in TRANSIENT_REJECTIONS:
+                retry_feeds.add(feed_url)
+            return None
+
+        if len(full_text) < 200:
+            print(f"⚠ Übersprungen ({feed_url}): {title} (zu kurz)")
+            skip(url, "too_short")
+            return None
+
+        # Проверка на релевантность и блокировку по ключевым словам
+        keywords = get_keyword_matcher(feed_url).match(full_text)
+        if not keywords.relevant:
+            print(f"⛔ Thema nicht relevant: {title}")
+            skip(url, "irrelevant")
+            return None
+
+        if keywords.blocked:
+            print(f"❌ Thema blockiert: {title} ({', '.join(keywords.blocked)})")
+            skip(url, "blocked")
+            return None
+
+        # Проверка на дубликаты по содержимому
+        if is_duplicate_content(full_text, sent):
+            print(f"🔄 Дубликат содержимого: {title}")
+            skip(url, "duplicate")
+            return None
+
+        # Копия статьи, которая уже суммаризируется в этом запуске в другом сюжете
+        # (источники того же сюжета не отбрасываются — они попадут в сообщение ссылками)
+        content_hash = get_content_hash(full_text)
+        fingerprint = get_text_simhash(full_text)
+        owners = [in_flight_stories.get(("content_hash", content_hash))]
+        near = in_flight.find_near_duplicate(fingerprint)
+        if near is not None:
+            owners.append(in_flight_stories.get(("simhash", near)))
+        if any(owner is not None and owner is not story for owner in owners):
+            print(f"🔄 Duplikat im aktuellen Lauf: {title}")
+            METRICS.inc("articles_skipped", reason="duplicate_in_run")
+            return None
+
+        # Старый метод хеширования для обратной совместимости
+        hash_base = (title + full_text[:300].lower()).strip()
+        hash_ = hashlib.md5(hash_base.encode("utf-8")).hexdigest()
+        if sent.has_hash(hash_):
+            print(f"🔄 Дубликат по старому хешу: {title}")
+            skip(url, "duplicate")
+            return None
+        owner = in_flight_stories.get(("hash", hash_))
+        if owner is not None and owner is not story:
+            print(f"🔄 Duplikat im aktuellen Lauf: {title}")
+            METRICS.inc("articles_skipped", reason="duplicate_in_run")
+            return None
+
+        print(f"🔄 Analysiere: {title}")
+        # Запоминаем статью в индексе текущего запуска, чтобы не суммаризировать её копии
+        in_flight.add(url=url, title=title, hash_=hash_, content_hash=content_hash, simhash=fingerprint)
+        for key in (("hash", hash_), ("content_hash", content_hash), ("simhash", fingerprint)):
+            in_flight_stories.setdefault(key, story)
+        return {"feed_url": feed_url, "url": url, "title": title, "hash": hash_, "content_hash": content_hash, "simhash": fingerprint, "text": full_text}
+
+    # Собираем кандидатов: дешёвые проверки до загрузки статей
+    candidates = []
+    seen_urls = set()
+    seen_titles = set()
+    feed_links = {}
+    for feed_url, feed, _ in fetched:
+        feed_links[feed_url] = [entry.get("link") for entry in feed.entries]
         for entry in feed.entries:
             url = entry.link
             title = entry.title
 
-            # Базовая проверка по URL и заголовку
-            if url in sent["urls"] or title in sent["titles"]:
-                print(f"⏩ Bereits verarbeitet: {title}")
+            # Одна и та же статья может быть в нескольких лентах
+            if url in seen_urls or title in seen_titles:
                 continue
 
-            published = entry.get("published_parsed")
-            if published:
-                pub_date = datetime.fromtimestamp(time.mktime(published))
-                if (datetime.utcnow() - pub_date).total_seconds() > MAX_AGE_SECONDS:
-                    print(f"⏳ Zu alt, übersprungen: {title}")
-                    continue
-
-            full_text = get_article_text(url)
-            full_text = clean_article_text(full_text)
-
-            if len(full_text) > MAX_CHARS:
-                print(f"⚠ Zu lang, übersprungen: {title} ({len(full_text)} Zeichen)")
+            # Статьи, отклонённые в прошлых запусках, пропускаем без сетевых запросов
+            rejected = get_rejection(rejections, url)
+            if rejected:
+                print(f"{SKIP_MESSAGES['rejected']} ({rejected}): {title}")
+                METRICS.inc("articles_skipped", reason="rejected_cache")
+                if rejected in TRANSIENT_REJECTIONS:
+                    retry_feeds.add(feed_url)
                 continue
 
-            if len(full_text) < 200:
-                print(f"⚠ Übersprungen ({feed_url}): {title} (zu kurz)")
+            # Проверки по URL, заголовку, возрасту и анонсу — без загрузки статьи
+            reason = prefilter_entry(feed_url, entry, sent)
+            if reason:
+                skip(url, reason)
+                print(f"{SKIP_MESSAGES[reason]}: {title}")
                 continue
 
-            # Проверка на релевантность и блокировку по ключевым словам
-            if not any(keyword.lower() in full_text.lower() for keyword in KEYWORDS):
-                print(f"⛔ Thema nicht relevant: {title}")
-                continue
+            seen_urls.add(url)
+            seen_titles.add(title)
+            age = get_entry_age(entry)
+            candidates.append({
+                "feed_url": feed_url,
+                "url": url,
+                "title": title,
+                "preview": get_entry_preview(entry),
+                "published": time.time() - age if age is not None else None,
+            })
 
-            if any(word in full_text.lower() for word in BLOCKED_KEYWORDS):
-                print(f"❌ Thema blockiert: {title}")
-                continue
+    # Отложенные в прошлых проходах кандидаты конкурируют с новыми на общих основаниях
+    for item in deferred or []:
+        url, title = item["url"], item["title"]
+        if url in seen_urls or title in seen_titles:
+            continue
+        if sent.has_url(url) or sent.has_title(title) or get_rejection(rejections, url):
+            continue
+        seen_urls.add(url)
+        seen_titles.add(title)
+        candidates.append({**{key: item.get(key) for key in DEFERRED_FIELDS}, "deferred_at": item.get("deferred_at")})
 
-            # Проверка на дубликаты по содержимому
-            if is_duplicate_content(full_text, sent):
-                print(f"🔄 Дубликат содержимого: {title}")
-                continue
+    print(f"📋 Kandidaten: {len(candidates)}")
+    METRICS.inc("candidates", len(candidates))
 
-            # Старый метод хеширования для обратной совместимости
-            hash_base = (title + full_text[:300].lower()).strip()
-            hash_ = hashlib.md5(hash_base.encode("utf-8")).hexdigest()
-            if hash_ in sent["hashes"]:
-                print(f"🔄 Дубликат по старому хешу: {title}")
-                continue
+    # Одно событие из разных лент — один сюжет: одно резюме и одно сообщение со всеми ссылками.
+    # Сюжеты ранжируются по лучшей статье и числу источников
+    stories = []
+    for members in cluster_stories([c["preview"] for c in candidates]):
+        story_candidates = [candidates[i] for i in members]
+        score = max(score_candidate(c) for c in story_candidates) + SCORE_SOURCE_WEIGHT * (len(members) - 1)
+        stories.append({"score": score, "candidates": story_candidates, "resolved": 0, "articles": []})
+    stories.sort(key=lambda story: story["score"], reverse=True)
 
-            # Новый метод хеширования только содержимого
-            content_hash = get_content_hash(full_text)
+    # Лимит ленты считается в сюжетах: сюжет проходит, если хотя бы у одной его ленты остался лимит
+    queue = []
+    feed_stories = {}
+    for story in stories:
+        feeds = {c["feed_url"] for c in story["candidates"]}
+        if all(feed_stories.get(f, 0) >= FEED_CONFIG.get(f, FEED_DEFAULTS)["max_per_run"] for f in feeds):
+            defer(story["candidates"], "feed_limit")
+            continue
+        for f in feeds:
+            feed_stories[f] = feed_stories.get(f, 0) + 1
+        queue.append(story)
+    ordered = []
+    for number, story in enumerate(queue):
+        for candidate in story["candidates"]:
+            candidate["story"] = number
+            ordered.append(candidate)
+    print(f"🧵 Сюжетов: {len(queue)} (отложено по лимиту лент: {len(stories) - len(queue)})")
+    METRICS.inc("stories", len(queue))
 
-            print(f"🔄 Analysiere: {title}")
-            summary = summarize(full_text)
-            if not summary:
-                continue
+    # Статьи загружаются в порядке очереди; когда бюджет исчерпан, остальные загрузки отменяются
+    with closing(fetch_articles(ordered)) as articles:
+        for candidate, full_text in articles:
+            candidate["resolved"] = True
+            story = queue[candidate["story"]]
+            article = check_article(candidate, full_text, story)
+            if article:
+                story["articles"].append(article)
+            # Сюжет суммаризируется, когда решено по всем его статьям
+            story["resolved"] += 1
+            if story["resolved"] == len(story["candidates"]) and story["articles"]:
+                submit_story(story)
 
-            caption = f"<b>📰 {title}</b>\n\n{summary}\n\n🔗 <a href='{url}'>Weiterlesen</a>"
+            # Отправляем уже готовые резюме, не дожидаясь конца загрузки статей
+            for future in [f for f in pending if f.done()]:
+                deliver(future, pending.pop(future))
 
-            success = send_message(caption)
-            if success:
-                print("✅ Gesendet")
-                sent["urls"].append(url)
-                sent["hashes"].append(hash_)
-                sent["content_hashes"].append(content_hash)
-                if title not in sent["titles"]:
-                    sent["titles"].append(title)
-                
-                # Сохраняем локальный кэш после каждой успешной отправки
-                save_local_cache(sent)
-            else:
-                print("⚠ Fehler beim Senden")
+            if budget.exhausted():
+                print(f"⏱ Бюджет прохода исчерпан: {budget.status()}")
+                break
 
-    save_sent_articles(sent, local_file)
-    print("\n" + "="*50)
-    print("🏁 ЗАВЕРШЕНИЕ РАБОТЫ БОТА")
-    print("="*50)
+    # Неотправленные сюжеты откладываются: нерешённые и прошедшие фильтры статьи
+    for story in queue:
+        if story.get("submitted"):
+            continue
+        accepted = {article["url"] for article in story["articles"]}
+        defer([c for c in story["candidates"] if not c.get("resolved") or c["url"] in accepted], "budget")
+
+    for future in as_completed(list(pending)):
+        deliver(future, pending.pop(future))
+    handle_outcomes(dispatcher.drain(flush=True))
+
+    summarizer.cache.save()
+    print(f"💰 Бюджет прохода: {budget.status()}")
+    if still_deferred:
+        print(f"⏸ Отложено на следующий проход: {len(still_deferred)}")
+    if deferred is not None:
+        deferred[:] = still_deferred
+
+    for feed_url, _, validators in fetched:
+        if feed_url not in retry_feeds:
+            feed_cache[feed_url] = validators
+    return feed_links
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+"""Бюджет одного прохода конвейера: токены LLM, время и число сообщений."""
+
+import time
+
+CHARS_PER_TOKEN = 4 # грубая оценка для немецкого и английского текста
+
+
+def estimate_tokens(text):
+    """Оценка числа токенов текста без токенизатора"""
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+class RunBudget:
+    """
+    Учитывает расход прохода: токены LLM (оценка до запроса), секунды с начала
+    прохода и число сообщений. Лимит 0 означает «без ограничения». Сюжет
+    резервирует бюджет перед суммаризацией; что не поместилось, откладывается.
+    """
+
+    def __init__(self, max_tokens=0, max_seconds=0, max_messages=0):
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.max_messages = max_messages
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.messages = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def out_of_time(self):
+        return bool(self.max_seconds) and self.elapsed() >= self.max_seconds
+
+    def exhausted(self):
+        """Бюджет исчерпан: время вышло или отправлено максимальное число сообщений"""
+        return self.out_of_time() or bool(self.max_messages) and self.messages >= self.max_messages
+
+    def reserve(self, tokens):
+        """
+        Резервирует одно сообщение и tokens токенов. Возвращает False, если не
+        помещается. Первый сюжет прохода допускается при любой оценке токенов,
+        иначе слишком длинный текст откладывался бы бесконечно.
+        """
+        if self.exhausted():
+            return False
+        if self.max_tokens and self.tokens and self.tokens + tokens > self.max_tokens:
+            return False
+        self.tokens += tokens
+        self.messages += 1
+        return True
+
+    def status(self):
+        return {
+            "tokens": self.tokens,
+            "messages": self.messages,
+            "seconds": round(self.elapsed(), 1),
+        }
@@ -0,0 +1,110 @@
+"""Индекс отправленных статей с поиском за O(1), кольцевым вытеснением и долгой памятью."""
+
+from collections import OrderedDict
+
+from near_duplicates import SimHashIndex
+
+FIELDS = ("urls", "titles", "hashes", "content_hashes")
+ARCHIVED_FIELDS = {"urls": "u:", "content_hashes": "c:"} # поле -> префикс ключа в архиве
+
+
+class SentIndex:
+    """
+    Хранит URL, заголовки, старые хеши и хеши содержимого отправленных статей.
+    Каждое поле — упорядоченное множество (OrderedDict), поэтому проверка наличия
+    выполняется за O(1), а при превышении max_items вытесняются самые старые записи.
+    Отпечатки SimHash для поиска почти-дубликатов хранятся в LSH-индексе.
+    Если передан archive (фильтр Блума), вытесненные URL и хеши содержимого
+    переходят в него и продолжают находиться has_url/has_content_hash.
+    Сериализуется в схему local_cache.json: {"urls": [...], "titles": [...], ...},
+    отпечатки — в поле "simhashes" в виде hex-строк; архив хранится отдельно.
+    """
+
+    def __init__(self, max_items, archive=None):
+        self.max_items = max_items
+        self.archive = archive
+        self._fields = {field: OrderedDict() for field in FIELDS}
+        self.simhashes = SimHashIndex(max_items)
+
+    @classmethod
+    def from_dict(cls, data, max_items, archive=None):
+        """Создаёт индекс из словаря со списками (формат local_cache.json)"""
+        index = cls(max_items, archive)
+        for field in FIELDS:
+            for value in (data or {}).get(field, []) or []:
+                index._add(field, value)
+        for value in (data or {}).get("simhashes", []) or []:
+            try:
+                index.simhashes.add(int(value, 16))
+            except (TypeError, ValueError):
+                continue
+        return index
+
+    def to_dict(self):
+        """Возвращает данные в формате local_cache.json"""
+        data = {field: list(values) for field, values in self._fields.items()}
+        data["simhashes"] = [f"{fingerprint:016x}" for fingerprint in self.simhashes.values()]
+        return data
+
+    def contains(self, field, value):
+        if not value:
+            return False
+        if value in self._fields[field]:
+            return True
+        return self.archive is not None and field in ARCHIVED_FIELDS and ARCHIVED_FIELDS[field] + value in self.archive
+
+    def has_url(self, url):
+        return self.contains("urls", url)
+
+    def has_title(self, title):
+        return self.contains("titles", title)
+
+    def has_hash(self, hash_):
+        return self.contains("hashes", hash_)
+
+    def has_content_hash(self, content_hash):
+        return self.contains("content_hashes", content_hash)
+
+    def find_near_duplicate(self, fingerprint):
+        """Ищет сохранённый отпечаток SimHash, близкий к переданному"""
+        return self.simhashes.find(fingerprint)
+
+    def add(self, url=None, title=None, hash_=None, content_hash=None, simhash=None):
+        """Добавляет отправленную статью во все поля и вытесняет лишние записи"""
+        for field, value in zip(FIELDS, (url, title, hash_, content_hash)):
+            self._add(field, value)
+        if simhash is not None:
+            self.simhashes.add(simhash)
+
+    def _add(self, field, value):
+        if not value:
+            return
+        values = self._fields[field]
+        if value in values:
+            return
+        values[value] = None
+        self.evict(field)
+
+    def evict(self, field=None):
+        """Удаляет самые старые записи сверх max_items"""
+        fields = (field,) if field else FIELDS
+        for name in fields:
+            values = self._fields[name]
+            while len(values) > self.max_items:
+                value, _ = values.popitem(last=False)
+                if self.archive is not None and name in ARCHIVED_FIELDS:
+                    self.archive.add(ARCHIVED_FIELDS[name] + value)
+
+    def values(self, field):
+        """Значения поля в порядке добавления"""
+        return list(self._fields[field])
+
+    def counts(self):
+        counts = {field: len(values) for field, values in self._fields.items()}
+        counts["simhashes"] = len(self.simhashes)
+        if self.archive is not None:
+            counts["archived"] = len(self.archive)
+        return counts
+
+    def __len__(self):
+        return len(self._fields["urls"])
@@ -0,0 +1,59 @@
+"""Атомарная запись снимков и журнал изменений (JSON Lines) для файлов состояния."""
+
+import json
+import os
+import tempfile
+
+
+def write_atomic(path, payload):
+    """
+    Записывает байты во временный файл рядом с path и атомарно заменяет им path.
+    При сбое посреди записи старый файл остаётся целым.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def append_record(path, record):
+    """Дописывает одну запись в журнал и возвращает его размер в байтах"""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def read_records(path):
+    """Читает записи журнала; недописанная последняя строка (сбой при записи) пропускается"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"⚠ Пропущена повреждённая запись журнала {path}")
+    return records
+
+
+def truncate(path):
+    """Очищает журнал после того, как его записи вошли в снимок"""
+    if os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,56 @@
+"""Группировка кандидатов одного запуска в сюжеты по сходству заголовка и лида."""
+
+import re
+from collections import defaultdict
+
+CLUSTER_SIMILARITY = 0.5 # минимальный коэффициент Жаккара значимых слов для одного сюжета
+MIN_TERM_LENGTH = 4 # более короткие слова (артикли, предлоги) не учитываются
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def story_terms(text):
+    """Множество значимых слов заголовка и лида"""
+    return frozenset(
+        word for word in WORD_PATTERN.findall(text.lower())
+        if len(word) >= MIN_TERM_LENGTH and not word.isdigit()
+    )
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_stories(texts, threshold=CLUSTER_SIMILARITY):
+    """
+    Объединяет тексты (заголовок + лид) в сюжеты: два текста попадают в один
+    сюжет, если сходство их слов не ниже threshold (транзитивно). Сравниваются
+    только тексты с общими словами, через инвертированный индекс.
+    Возвращает списки индексов texts, в порядке первого вхождения.
+    """
+    terms = [story_terms(text) for text in texts]
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    postings = defaultdict(list)
+    for i, words in enumerate(terms):
+        neighbours = set()
+        for word in words:
+            neighbours.update(postings[word])
+        for j in neighbours:
+            if find(i) != find(j) and jaccard(words, terms[j]) >= threshold:
+                parent[find(i)] = find(j)
+        for word in words:
+            postings[word].append(i)
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
@@ -0,0 +1,219 @@
+"""Клиент суммаризации: параллельные запросы к LLM с лимитами, повторами и кэшем."""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Ограничивает число запросов в минуту, равномерно распределяя их во времени"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SummaryCache:
+    """
+    Постоянный кэш готовых резюме по ключу "модель:хеш содержимого".
+    Если отправка в Telegram не удалась, резюме берётся из кэша в следующем запуске.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._items = json.load(f)
+            except Exception as e:
+                print(f"⚠ Ошибка при чтении кэша резюме: {e}")
+        self._prune()
+        return self
+
+    def _prune(self):
+        now = time.time()
+        self._items = {key: item for key, item in self._items.items() if item.get("created", 0) + self.ttl > now}
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+        return item.get("summary") if item else None
+
+    def put(self, key, summary):
+        with self._lock:
+            self._items[key] = {"summary": summary, "created": int(time.time())}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return True
+            self._prune()
+            try:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self._items, f, ensure_ascii=False, separators=(",", ":"))
+                self._dirty = False
+                print(f"💾 Кэш резюме обновлен: {len(self._items)}")
+                return True
+            except Exception as e:
+                print(f"⚠ Ошибка при сохранении кэша резюме: {e}")
+                return False
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Summarizer:
+    """
+    Отправляет запросы chat-completions в пуле потоков с ограничением
+    параллельности и частоты, повторяет их при 429/5xx с экспоненциальной
+    задержкой (Retry-After учитывается до max_retry_delay, дольше — сразу отказ)
+    и кэширует результат. Длинный текст, переданный фрагментами (chunks),
+    суммаризируется по схеме map-reduce: резюме каждого фрагмента через
+    build_chunk_prompt, затем итоговое по ним.
+    Если передан metrics, в него пишутся задержки запросов, число токенов
+    и попадания в кэш.
+    """
+
+    def __init__(self, session, url, headers, model, build_prompt, max_tokens,
+                 concurrency, requests_per_minute, max_retries, cache=None, timeout=60, metrics=None,
+                 build_chunk_prompt=None, chunk_max_tokens=None, max_retry_delay=60):
+        self.session = session
+        self.url = url
+        self.headers = headers
+        self.model = model
+        self.build_prompt = build_prompt
+        self.build_chunk_prompt = build_chunk_prompt or build_prompt
+        self.max_tokens = max_tokens
+        self.chunk_max_tokens = chunk_max_tokens or max_tokens
+        self.max_retries = max_retries
+        self.max_retry_delay = max_retry_delay
+        self.timeout = timeout
+        self.cache = cache
+        self.metrics = metrics
+        self.limiter = RateLimiter(requests_per_minute)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def cache_key(self, content_hash):
+        return f"{self.model}:{content_hash}"
+
+    def is_cached(self, content_hash):
+        """Есть ли готовое резюме для содержимого (запрос к LLM не понадобится)"""
+        return self.cache is not None and bool(self.cache.get(self.cache_key(content_hash)))
+
+    def submit(self, text, content_hash=None, chunks=None):
+        """Ставит текст в очередь на суммаризацию, возвращает Future со строкой резюме"""
+        return self._pool.submit(self.summarize, text, content_hash, chunks)
+
+    def summarize(self, text, content_hash=None, chunks=None):
+        """
+        Возвращает резюме текста (из кэша или от LLM); пустая строка при ошибке.
+        С chunks резюме строится по фрагментам (map-reduce), text не используется.
+        """
+        key = self.cache_key(content_hash) if content_hash else None
+        if key and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached:
+                print("♻ Резюме взято из кэша")
+                if self.metrics:
+                    self.metrics.inc("summary_cache_hits")
+                return cached
+        if chunks:
+            summary = self._map_reduce(chunks)
+        else:
+            summary = self._request(self.build_prompt(text))
+        if summary and key and self.cache is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    def _map_reduce(self, chunks):
+        """Резюме фрагментов по очереди, затем одно итоговое резюме по ним"""
+        partials = []
+        for chunk in chunks:
+            partial = self._request(self.build_chunk_prompt(chunk), self.chunk_max_tokens)
+            if not partial:
+                return ""
+            partials.append(partial)
+        if self.metrics:
+            self.metrics.inc("llm_map_reduce_chunks", len(chunks))
+        return self._request(self.build_prompt("\n\n".join(partials)))
+
+    def _request(self, prompt, max_tokens=None):
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": max_tokens or self.max_tokens,
+        }
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            delay = 2 ** attempt
+            started = time.perf_counter()
+            try:
+                res = self.session.post(self.url, headers=self.headers, json=payload, timeout=self.timeout)
+                if self.metrics:
+                    self.metrics.observe("llm_request", time.perf_counter() - started)
+                    self.metrics.inc("llm_requests", status=res.status_code)
+                if res.status_code in RETRY_STATUS_CODES:
+                    delay = retry_after_seconds(res, delay)
+                    if delay > self.max_retry_delay:
+                        # Ждать так долго в проходе нельзя: статья будет повторена в следующем запуске
+                        print(f"Fehler bei Zusammenfassung: HTTP {res.status_code}, Retry-After {delay:g} s")
+                        return ""
+                    raise requests.HTTPError(f"{res.status_code} от LLM", response=res)
+                res.raise_for_status()
+                result = res.json()
+                usage = result.get("usage") or {}
+                if self.metrics and usage:
+                    self.metrics.inc("llm_tokens", usage.get("prompt_tokens", 0), type="prompt")
+                    self.metrics.inc("llm_tokens", usage.get("completion_tokens", 0), type="completion")
+                if "choices" in result and isinstance(result["choices"], list):
+                    return result["choices"][0]["message"]["content"].strip()
+                print("Fehler bei Zusammenfassung: unerwartete Antwort", result)
+                return ""
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                    print("Fehler bei Zusammenfassung:", e)
+                    return ""
+                if attempt >= self.max_retries:
+                    print("Fehler bei Zusammenfassung:", e)
+                    return ""
+                print(f"⏳ LLM недоступна ({e}), повтор через {delay} с")
+                time.sleep(delay)
+            except Exception as e:
+                print("Fehler bei Zusammenfassung:", e)
+                return ""
+        return ""
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def retry_after_seconds(response, default):
+    """Задержка из заголовка Retry-After (в секундах) или значение по умолчанию"""
+    try:
+        return max(float(response.headers.get("Retry-After", default)), 0)
+    except (TypeError, ValueError):
+        return default
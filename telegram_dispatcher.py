@@ -0,0 +1,147 @@
+"""Очередь исходящих сообщений Telegram с лимитом частоты, повторами и режимом дайджеста."""
+
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+DispatchResult = namedtuple("DispatchResult", ["ok", "status", "error", "message_id", "attempts"])
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_MESSAGE_CHARS = 4096 # лимит Telegram на длину текста сообщения
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+class TelegramDispatcher:
+    """
+    Отправляет сообщения в чат через общую сессию, выдерживая минимальный
+    интервал между сообщениями. При 429 ждёт retry_after из ответа Telegram
+    (если он не больше max_retry_after, иначе сразу возвращает неудачу),
+    при 5xx и сетевых ошибках повторяет с экспоненциальной задержкой.
+    В режиме дайджеста короткие сообщения копятся и при flush упаковываются
+    в одно сообщение до MAX_MESSAGE_CHARS символов. Если передан metrics,
+    в него пишутся задержки отправки и итоги по сообщениям.
+    """
+
+    def __init__(self, session, api_base, token, chat_id, min_interval=1.0, max_retries=3,
+                 digest=False, digest_item_max_chars=800, timeout=30, metrics=None, max_retry_after=60):
+        self.session = session
+        self.url = f"{api_base}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.digest = digest
+        self.digest_item_max_chars = digest_item_max_chars
+        self.timeout = timeout
+        self.metrics = metrics
+        self._queue = []
+        self._last_sent = 0.0
+        self._lock = threading.Lock()
+
+    def submit(self, text, context=None):
+        """Ставит сообщение в очередь; context возвращается вместе с результатом"""
+        self._queue.append((text, context))
+
+    def drain(self, flush=False):
+        """
+        Отправляет сообщения из очереди и возвращает список пар (context, DispatchResult).
+        В режиме дайджеста короткие сообщения ждут flush=True.
+        """
+        outcomes = []
+        queue, self._queue = self._queue, []
+        batch = []
+        for text, context in queue:
+            if self.digest and len(text) <= self.digest_item_max_chars:
+                batch.append((text, context))
+                continue
+            outcomes.append((context, self.send(text)))
+        if batch and not flush:
+            self._queue.extend(batch)
+            return outcomes
+        for texts, contexts in pack_digest(batch):
+            result = self.send(DIGEST_SEPARATOR.join(texts))
+            outcomes.extend((context, result) for context in contexts)
+        return outcomes
+
+    def _wait_turn(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._last_sent + self.min_interval)
+            self._last_sent = slot
+        if slot > now:
+            time.sleep(slot - now)
+
+    def send(self, text):
+        """Отправляет одно сообщение с повторами; возвращает DispatchResult"""
+        result = self._send(text)
+        if self.metrics:
+            self.metrics.inc("telegram_messages", status="ok" if result.ok else "failed")
+            if result.attempts > 1:
+                self.metrics.inc("telegram_retries", result.attempts - 1)
+        return result
+
+    def _send(self, text):
+        payload = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": False
+        }
+        status = None
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            self._wait_turn()
+            delay = 2 ** (attempt - 1)
+            started = time.perf_counter()
+            try:
+                res = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if self.metrics:
+                    self.metrics.observe("telegram_send", time.perf_counter() - started)
+                status = res.status_code
+                try:
+                    body = res.json()
+                except ValueError:
+                    body = {}
+                if status == 200 and body.get("ok", True):
+                    message_id = (body.get("result") or {}).get("message_id")
+                    return DispatchResult(True, status, None, message_id, attempt)
+                error = body.get("description") or f"HTTP {status}"
+                if status not in RETRY_STATUS_CODES:
+                    break
+                if status == 429:
+                    delay = (body.get("parameters") or {}).get("retry_after") or res.headers.get("Retry-After") or delay
+                    try:
+                        delay = max(float(delay), 0)
+                    except (TypeError, ValueError):
+                        delay = 2 ** (attempt - 1)
+                    if delay > self.max_retry_after:
+                        # Дольше ждать нельзя: сообщение будет повторено в следующем запуске
+                        error = f"{error} (retry_after={delay:g})"
+                        break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            if attempt > self.max_retries:
+                break
+            print(f"⏳ Telegram: {error}, повтор через {delay} с")
+            time.sleep(float(delay))
+        return DispatchResult(False, status, error, None, attempt)
+
+
+def pack_digest(items):
+    """Группирует (text, context) в пакеты, каждый из которых помещается в одно сообщение"""
+    packs = []
+    texts, contexts, size = [], [], 0
+    for text, context in items:
+        extra = len(text) + (len(DIGEST_SEPARATOR) if texts else 0)
+        if texts and size + extra > MAX_MESSAGE_CHARS:
+            packs.append((texts, contexts))
+            texts, contexts, size = [], [], 0
+            extra = len(text)
+        texts.append(text)
+        contexts.append(context)
+        size += extra
+    if texts:
+        packs.append((texts, contexts))
+    return packs
@@ -0,0 +1,91 @@
+"""Сокращение текста статьи до бюджета токенов: лид и самые содержательные абзацы."""
+
+import math
+import re
+
+from run_budget import CHARS_PER_TOKEN, estimate_tokens
+
+LEAD_PARAGRAPHS = 2 # первые абзацы (лид) сохраняются всегда, если помещаются
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_paragraphs(text, max_tokens=None):
+    """
+    Абзацы текста (по строкам). Абзацы длиннее max_tokens делятся по границам
+    предложений, чтобы один огромный блок не занимал весь бюджет.
+    """
+    paragraphs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not max_tokens or estimate_tokens(line) <= max_tokens:
+            paragraphs.append(line)
+            continue
+        piece = ""
+        for sentence in SENTENCE_BOUNDARY.split(line):
+            candidate = f"{piece} {sentence}" if piece else sentence
+            if piece and estimate_tokens(candidate) > max_tokens:
+                paragraphs.append(piece)
+                candidate = sentence
+            piece = candidate
+        if piece:
+            paragraphs.append(piece)
+    return paragraphs
+
+
+def reduce_text(text, token_budget, score=None):
+    """
+    Сокращает текст до token_budget: сначала лид (LEAD_PARAGRAPHS абзацев), затем
+    абзацы с наибольшей плотностью score(абзац) на токен. Абзацы остаются в исходном
+    порядке. Без score добираются абзацы по порядку.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    paragraphs = split_paragraphs(text, max(1, token_budget // 2))
+    costs = [estimate_tokens(p) for p in paragraphs]
+    lead = range(min(LEAD_PARAGRAPHS, len(paragraphs)))
+    rest = range(len(lead), len(paragraphs))
+    if score is not None:
+        rest = sorted(rest, key=lambda i: (-score(paragraphs[i]) / costs[i], i))
+
+    keep = []
+    used = 0
+    for i in list(lead) + list(rest):
+        if used + costs[i] > token_budget:
+            continue
+        keep.append(i)
+        used += costs[i]
+    if not keep:
+        return text[:token_budget * CHARS_PER_TOKEN]
+    return "\n".join(paragraphs[i] for i in sorted(keep))
+
+
+def chunk_text(text, chunk_tokens, max_chunks=None):
+    """
+    Делит текст на фрагменты примерно по chunk_tokens, но не больше max_chunks:
+    тогда фрагменты укрупняются до равных долей текста. Длинные абзацы делятся
+    по предложениям; каждый кусок попадает во фрагмент по своей середине, так что
+    порядок сохраняется, а число фрагментов не превышает заданного.
+    """
+    pieces = split_paragraphs(text, chunk_tokens)
+    costs = [estimate_tokens(piece) for piece in pieces]
+    total = sum(costs)
+    if not total:
+        return []
+    count = math.ceil(total / chunk_tokens)
+    if max_chunks:
+        count = min(count, max_chunks)
+    if count > 1:
+        # Куски не крупнее доли фрагмента, иначе один абзац сместит границы
+        pieces = split_paragraphs(text, math.ceil(total / count))
+        costs = [estimate_tokens(piece) for piece in pieces]
+        total = sum(costs)
+
+    chunks = [[] for _ in range(count)]
+    used = 0
+    for piece, cost in zip(pieces, costs):
+        index = min(count - 1, int((used + cost / 2) * count / total))
+        chunks[index].append(piece)
+        used += cost
+    return ["\n".join(chunk) for chunk in chunks if chunk]